@@ -0,0 +1,139 @@
+"""
+P-uppgift - periodiska systemet
+headless benchmark of the game classes in games.py
+
+Drives every game with scripted answers and reports questions per second,
+p50/p99 latency of update and the peak memory update uses on top of what was already
+allocated, per answer. The periodic game has no attempts, so it has no out-of-attempts row.
+
+Run from the repository root: python -m benchmarks.game_engine [--max-p99-us N]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from types import SimpleNamespace
+import games
+import model
+
+UPDATES = 20000
+
+GAMES = (games.AtnumGame, games.NameGame, games.SymbolGame, games.MassGame, games.PeriodicGame)
+
+
+def _correct(game):
+    question = game.current_question
+    if isinstance(game, games.MassGame):
+        return question.mass
+    if isinstance(game, games.PeriodicGame):
+        return question
+    return str(getattr(question, game.correct_attr))
+
+
+def _wrong(game):
+    question = game.current_question
+    if isinstance(game, games.MassGame):
+        return question.mass + 1
+    if isinstance(game, games.PeriodicGame):
+        return game.elements.get_element((question.index + 1) % len(game.elements))
+    return "0" if game.correct_attr == "atnum" else "fel"
+
+
+def _malformed(game):
+    if isinstance(game, games.PeriodicGame):
+        return SimpleNamespace(pos=(0, 0)) # A click outside of the table
+    return "abc"
+
+
+# Each scenario returns the answer to give, based on how many answers the current question has had
+SCENARIOS = {
+    "correct": lambda game, tries: _correct(game),
+    "wrong": lambda game, tries: _wrong(game) if tries == 0 else _correct(game),
+    "malformed": lambda game, tries: _malformed(game) if tries == 0 else _correct(game),
+    "out-of-attempts": lambda game, tries: _wrong(game),
+}
+
+
+def _run(game_class, table, scenario, trace=False) -> dict:
+    # Plays UPDATES answers and returns the measurements
+    answer_for = SCENARIOS[scenario]
+    game = game_class(table)
+    latencies = []
+    peak_bytes = 0
+    questions = 0
+    tries = 0
+
+    start = time.perf_counter()
+    for _ in range(UPDATES):
+        if game.current_question is None: # A finished PeriodicGame
+            game = game_class(table)
+
+        # Same calls as the GUI does on every render
+        game.get_current_question()
+        game.get_question_status()
+        if isinstance(game, games.MassGame):
+            game.get_answers()
+
+        question = game.current_question
+        answer = answer_for(game, tries)
+        if trace:
+            before = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+        update_start = time.perf_counter_ns()
+        game.update(answer)
+        latencies.append(time.perf_counter_ns() - update_start)
+        if trace:
+            peak_bytes += tracemalloc.get_traced_memory()[1] - before
+
+        if game.current_question is not question:
+            questions += 1
+            tries = 0
+        else:
+            tries += 1
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "questions_per_s": questions / elapsed,
+        "p50_us": latencies[len(latencies) // 2] / 1000,
+        "p99_us": latencies[int(len(latencies) * 0.99)] / 1000,
+        "mean_us": statistics.fmean(latencies) / 1000,
+        "peak_b": peak_bytes / UPDATES,
+    }
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-p99-us", type=float, help="exit with status 1 if any p99 update latency is above this")
+    args = parser.parse_args()
+
+    table = model.PeriodicTable()
+    failed = False
+
+    print(f"{'game':<14}{'scenario':<17}{'questions/s':>12}{'p50 us':>9}{'p99 us':>9}{'peak B/answer':>15}")
+    for game_class in GAMES:
+        for scenario in SCENARIOS:
+            if scenario == "out-of-attempts" and game_class is games.PeriodicGame:
+                continue # Tries until right, it would measure the same as wrong
+            result = _run(game_class, table, scenario)
+
+            # Memory is measured in a separate pass since tracing slows everything down
+            tracemalloc.start()
+            result["peak_b"] = _run(game_class, table, scenario, trace=True)["peak_b"]
+            tracemalloc.stop()
+
+            print(f"{game_class.__name__:<14}{scenario:<17}{result['questions_per_s']:>12.0f}"
+                  f"{result['p50_us']:>9.2f}{result['p99_us']:>9.2f}{result['peak_b']:>15.1f}")
+            if args.max_p99_us is not None and result["p99_us"] > args.max_p99_us:
+                failed = True
+
+    if failed:
+        print(f"FAILED: p99 update latency above {args.max_p99_us} us")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+P-uppgift - periodiska systemet
+benchmark of refreshing the heatmap for a whole class
+
+Writes the stats of many synthetic learners to a temporary directory, then times loading and
+adding them together, and computing the colors of all elements. The colors are compared with
+a loop over the elements, which is how it would be done without NumPy. Needs NumPy.
+
+Run from the repository root: python -m benchmarks.heatmap_refresh [--learners N]
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import numpy as np
+import heatmap
+from model import PeriodicTable
+
+ROUNDS = 200
+
+
+def _colors_loop(stats: heatmap.ErrorStats, atnums) -> list[str]:
+    # One element at a time, the baseline for ErrorStats.colors
+    colors = []
+    for atnum in atnums:
+        wrong, right = int(stats.counts[heatmap.WRONG, atnum]), int(stats.counts[heatmap.RIGHT, atnum])
+        if wrong + right == 0:
+            colors.append("#%02x%02x%02x" % heatmap.UNSEEN_RGB)
+            continue
+        rgb = [int(np.interp(wrong / (wrong + right), heatmap.GRADIENT_STOPS, heatmap.GRADIENT_RGB[:, channel]))
+               for channel in range(3)]
+        colors.append("#%02x%02x%02x" % tuple(rgb))
+    return colors
+
+
+def _median_ms(function) -> float:
+    times = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        function()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--learners", type=int, default=500)
+    parser.add_argument("--answers", type=int, default=2000, help="answers per learner")
+    args = parser.parse_args()
+
+    elements = PeriodicTable()
+    atnums = np.fromiter((element.atnum for element in elements.get_all_elements()), dtype=np.intp)
+    size = atnums.max() + 1
+    rng = np.random.default_rng(0)
+
+    with tempfile.TemporaryDirectory() as directory:
+        paths = []
+        for learner in range(args.learners):
+            stats = heatmap.ErrorStats(size)
+            stats.add_many(rng.choice(atnums, args.answers), rng.random(args.answers) < 0.7)
+            paths.append(os.path.join(directory, f"{learner}.npy"))
+            stats.save(paths[-1])
+
+        start = time.perf_counter()
+        total = heatmap.load_all(paths, size)
+        load_ms = (time.perf_counter() - start) * 1000
+
+    assert total.colors(atnums) == _colors_loop(total, atnums)
+    print(f"load {args.learners} learners: {load_ms:8.2f} ms")
+    print(f"colors, vectorized:    {_median_ms(lambda: total.colors(atnums)):8.3f} ms")
+    print(f"colors, loop:          {_median_ms(lambda: _colors_loop(total, atnums)):8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""
+P-uppgift - periodiska systemet
+benchmark of the import time of the headless modules (model and games)
+
+Runs a fresh interpreter with python -X importtime and fails if the imports take longer
+than the budget or if tkinter gets imported.
+
+Run from the repository root: python -m benchmarks.import_time [--budget-ms N]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+HEADLESS_MODULES = ("model", "games")
+ROUNDS = 5
+
+
+def _import_times(modules) -> dict[str, int]:
+    # Returns the cumulative import time in us of every module that was imported
+    # Bytecode is written and used like in a normal installation, compiling isnt measured
+    env = {name: value for name, value in os.environ.items() if name != "PYTHONDONTWRITEBYTECODE"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import " + ", ".join(modules)],
+        capture_output=True, text=True, check=True, env=env)
+
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, package = line.split("|")
+        times[package.strip()] = int(cumulative)
+    return times
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=20.0)
+    args = parser.parse_args()
+
+    _import_times(HEADLESS_MODULES) # Compiles the bytecode
+    # The fastest round is used, the others are mostly noise from the OS
+    rounds = [_import_times(HEADLESS_MODULES) for _ in range(ROUNDS)]
+    best = min(rounds, key=lambda times: sum(times[module] for module in HEADLESS_MODULES))
+
+    total_ms = sum(best[module] for module in HEADLESS_MODULES) / 1000
+    for module in HEADLESS_MODULES:
+        print(f"{module:<8}{best[module] / 1000:>8.2f} ms")
+    print(f"{'total':<8}{total_ms:>8.2f} ms (budget {args.budget_ms} ms)")
+
+    if "tkinter" in best:
+        print("FAILED: tkinter is imported by the headless modules")
+        sys.exit(1)
+    if total_ms > args.budget_ms:
+        print("FAILED: over budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
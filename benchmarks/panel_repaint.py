@@ -0,0 +1,71 @@
+"""
+P-uppgift - periodiska systemet
+benchmark of the submit-to-repaint latency of the InputPanel
+
+Submits answers through App and waits for Tk to finish the repaint. The "rebuild" rows throw
+away the panel layouts before every submit, which is how the panel used to work, and are
+the baseline for the retained "update" rows. The journals and results are written to a
+temporary directory, not to the ones of the game. Needs a display.
+
+Run from the repository root: python -m benchmarks.panel_repaint
+"""
+
+import os
+import tempfile
+import time
+import tkinter as tk
+import games
+import periodiska_gui
+
+SUBMITS = 300
+
+
+def _answer(game):
+    if isinstance(game, games.MassGame):
+        return game.get_answers()[0]
+    return "1"
+
+
+def _forget_layouts(panel: periodiska_gui.InputPanel) -> None:
+    # Makes the next update build its layout from scratch
+    for layout in panel.layouts.values():
+        layout["frame"].destroy()
+    panel.layouts = {}
+    panel.current_layout = None
+
+
+def _measure(app: periodiska_gui.App, game_class, rebuild: bool) -> list[float]:
+    app.start_game(game_class)
+    app.root.update()
+    times = []
+    for _ in range(SUBMITS):
+        if rebuild:
+            _forget_layouts(app.panel)
+        start = time.perf_counter()
+        app.submit_answer(_answer(app.game_instance))
+        app.root.update_idletasks() # Geometry and redraw of the changed widgets
+        times.append((time.perf_counter() - start) * 1000)
+    app.back()
+    return sorted(times)
+
+
+def main():
+    """Main"""
+    with tempfile.TemporaryDirectory() as directory:
+        root = tk.Tk()
+        app = periodiska_gui.App(root, journal_dir=directory,
+                                 results_path=os.path.join(directory, "results.sqlite3"),
+                                 error_stats_path=os.path.join(directory, "errors.npy"))
+
+        print(f"{'game':<12}{'mode':<9}{'p50 ms':>8}{'p99 ms':>8}")
+        for game_class in (games.AtnumGame, games.MassGame):
+            for rebuild in (True, False):
+                times = _measure(app, game_class, rebuild)
+                print(f"{game_class.__name__:<12}{'rebuild' if rebuild else 'update':<9}"
+                      f"{times[len(times) // 2]:>8.3f}{times[int(len(times) * 0.99)]:>8.3f}")
+        app.results.close()
+        root.destroy()
+
+
+if __name__ == "__main__":
+    main()
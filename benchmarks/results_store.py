@@ -0,0 +1,78 @@
+"""
+P-uppgift - periodiska systemet
+benchmark of the results store with a large synthetic history
+
+Plays a school year of synthetic games through ResultsStore into a temporary database, then
+times the leaderboard, personal best and history queries. The "scan" row is the leaderboard
+computed from the games table with GROUP BY, which is what the bests table avoids.
+
+Run from the repository root: python -m benchmarks.results_store [--games N] [--users N]
+"""
+
+import argparse
+import os
+import random
+import tempfile
+import time
+from results import MIN_ANSWERS, ResultsStore
+
+GAME_TYPES = ("AtnumGame", "NameGame", "SymbolGame", "MassGame", "PeriodicGame")
+QUERIES = 300
+
+
+def _seed(store: ResultsStore, games: int, users: int, answers: int) -> float:
+    # Returns the inserted answers per second
+    rng = random.Random(0)
+    start = time.perf_counter()
+    for _ in range(games):
+        store.start_game(rng.choice(GAME_TYPES), f"elev{rng.randrange(users)}")
+        skill = rng.random()
+        for _ in range(rng.randint(1, 2 * answers)):
+            store.record_answer(rng.randint(1, 103), rng.random() < skill)
+    store.end_game()
+    return store.db.execute("SELECT count(*) FROM answers").fetchone()[0] / (time.perf_counter() - start)
+
+
+def _percentiles(query) -> tuple[float, float]:
+    times = []
+    for _ in range(QUERIES):
+        start = time.perf_counter()
+        query()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2], times[int(len(times) * 0.99)]
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--games", type=int, default=100000)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--answers", type=int, default=20, help="mean answers per game")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "results.sqlite3")
+        store = ResultsStore(path)
+        rate = _seed(store, args.games, args.users, args.answers)
+        rows = store.db.execute("SELECT count(*) FROM answers").fetchone()[0]
+        print(f"seeded {args.games} games, {rows} answers, {rate:.0f} answers/s, {os.path.getsize(path) / 1e6:.0f} MB\n")
+
+        rng = random.Random(1)
+        queries = {
+            "leaderboard": lambda: store.leaderboard(rng.choice(GAME_TYPES), 10),
+            "personal best": lambda: store.personal_best(rng.choice(GAME_TYPES), f"elev{rng.randrange(args.users)}"),
+            "history": lambda: store.history(rng.choice(GAME_TYPES), f"elev{rng.randrange(args.users)}", 10),
+            "leaderboard, scan": lambda: store.db.execute(
+                "SELECT user, max(1.0 * correct / answers) AS best FROM games WHERE game = ? AND answers >= ?"
+                " GROUP BY user ORDER BY best DESC LIMIT 10", (rng.choice(GAME_TYPES), MIN_ANSWERS)).fetchall(),
+        }
+        print(f"{'query':<20}{'p50 ms':>10}{'p99 ms':>10}")
+        for name, query in queries.items():
+            p50, p99 = _percentiles(query)
+            print(f"{name:<20}{p50:>10.3f}{p99:>10.3f}")
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
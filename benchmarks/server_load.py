@@ -0,0 +1,91 @@
+"""
+P-uppgift - periodiska systemet
+load test of the quiz server with thousands of concurrent sessions
+
+Starts a QuizServer in the same process, opens sessions of every game over a number of
+loopback connections and answers questions in all of them concurrently. Reports request
+latency, memory per session and that idle sessions get evicted.
+
+Run from the repository root: python -m benchmarks.server_load [--sessions N] [--connections N]
+"""
+
+import argparse
+import asyncio
+import itertools
+import time
+import tracemalloc
+import server
+from model import PeriodicTable
+
+ROUNDS = 5
+
+
+def _answer_for(game: str, state: dict):
+    # A simple learner that picks the first choice or a fixed guess
+    if game == "mass":
+        return 0
+    if game == "periodic":
+        return [1, 1]
+    return "1"
+
+
+async def _learner(client: server.QuizClient, sessions: list[tuple[str, dict]], latencies: list[float]) -> None:
+    # Answers ROUNDS questions in each of the sessions of one connection
+    for _ in range(ROUNDS):
+        for i, (game, state) in enumerate(sessions):
+            start = time.perf_counter()
+            state = await client.answer(state["session"], _answer_for(game, state))
+            latencies.append(time.perf_counter() - start)
+            sessions[i] = (game, state)
+
+
+async def _run(session_count: int, connection_count: int) -> None:
+    quiz_server = server.QuizServer(PeriodicTable())
+    port = await quiz_server.start(port=0)
+    clients = [server.QuizClient(port=port) for _ in range(connection_count)]
+    await asyncio.gather(*(client.connect() for client in clients))
+
+    # Memory is traced only while the sessions are created, tracing slows down everything
+    tracemalloc.start()
+    game_names = itertools.cycle(server.GAMES)
+    per_client = [[] for _ in clients]
+    for i in range(session_count):
+        game = next(game_names)
+        per_client[i % connection_count].append((game, await clients[i % connection_count].start_game(game)))
+    # Only memory allocated by the server side modules counts, not the clients
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        [tracemalloc.Filter(True, f"*{name}.py") for name in ("server", "games", "model", "scheduler")])
+    session_bytes = sum(stat.size for stat in snapshot.statistics("filename")) / session_count
+    tracemalloc.stop()
+
+    latencies = []
+    start = time.perf_counter()
+    await asyncio.gather(*(_learner(client, sessions, latencies) for client, sessions in zip(clients, per_client)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    print(f"sessions:      {len(quiz_server.sessions)} over {connection_count} connections")
+    print(f"memory:        {session_bytes:.0f} B per session")
+    print(f"answers:       {len(latencies) / elapsed:.0f} per s")
+    print(f"latency:       p50 {latencies[len(latencies) // 2] * 1000:.2f} ms,"
+          f" p99 {latencies[int(len(latencies) * 0.99)] * 1000:.2f} ms")
+
+    quiz_server.idle_timeout = 0.1 # Every session is idle now
+    await asyncio.sleep(quiz_server.idle_timeout)
+    print(f"evicted:       {quiz_server.evict_idle()} idle sessions, {len(quiz_server.sessions)} left")
+
+    await asyncio.gather(*(client.close() for client in clients))
+    await quiz_server.stop()
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=5000)
+    parser.add_argument("--connections", type=int, default=100)
+    args = parser.parse_args()
+    asyncio.run(_run(args.sessions, args.connections))
+
+
+if __name__ == "__main__":
+    main()
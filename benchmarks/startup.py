@@ -0,0 +1,37 @@
+"""
+P-uppgift - periodiska systemet
+benchmark of the startup time, cold (no cache) vs warm (cached) loading of elements.txt
+
+Run from the repository root: python -m benchmarks.startup
+"""
+
+import os
+import time
+import model
+
+ROUNDS = 200
+
+
+def _time_load(cold: bool) -> float:
+    # Returns the median time in ms of loading the PeriodicTable
+    times = []
+    for _ in range(ROUNDS):
+        if cold and os.path.exists(model.CACHE_PATH):
+            os.remove(model.CACHE_PATH)
+        start = time.perf_counter()
+        model.PeriodicTable()
+        times.append((time.perf_counter() - start) * 1000)
+    times.sort()
+    return times[len(times) // 2]
+
+
+def main():
+    """Main"""
+    cold = _time_load(cold=True)
+    warm = _time_load(cold=False)
+    print(f"cold: {cold:.3f} ms")
+    print(f"warm: {warm:.3f} ms ({cold / warm:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,33 +3,94 @@ P-uppgift - periodiska systemet
 games-file
 """
 
-import random
+import sys
+import weakref
+from array import array
+from collections import deque
+import instrument
+import matching
+from model import make_rng
+from scheduler import LeitnerScheduler
+
+_DECOY_POOLS = weakref.WeakKeyDictionary() # Decoy pools for MassGame, built once per table and offset
+
+
+def _decoy_pools(elements, offset_factor: float = 0.125, min_offset: float = 5) -> list[tuple[range, int]]:
+    """Returns, for every element index, the range of rounded masses that can be used as
+    answer choices together with the elements own rounded mass."""
+
+    pools_by_offset = _DECOY_POOLS.setdefault(elements, {})
+    if (offset_factor, min_offset) not in pools_by_offset:
+        pools = []
+        for element in elements.get_all_elements():
+            true_mass = element.mass
+            offset = max(true_mass*offset_factor, min_offset) # Adjust dynamically depending on how large mass is
+            lower = max(true_mass-offset, 1) # Cant be negative or zero
+            upper = true_mass+offset
+            pools.append((range(round(lower), round(upper)+1), round(true_mass)))
+        pools_by_offset[(offset_factor, min_offset)] = pools
+    return pools_by_offset[(offset_factor, min_offset)]
+
+
+_QUESTION_BANKS = weakref.WeakKeyDictionary() # Table -> {game name: QuestionBank}
+
+
+class QuestionBank:
+    """The prompt of every element for one game type, and for games with a written answer
+    the correct value and the accepted (casefolded) answers. Indexed by element index."""
+
+    __slots__ = ("prompts", "correct", "accepted")
+
+    def __init__(self, elements, question, correct_attr: str | None = None):
+        all_elements = elements.get_all_elements()
+        self.prompts = tuple(sys.intern(question(element)) for element in all_elements)
+        self.correct = tuple(getattr(element, correct_attr) for element in all_elements) if correct_attr else ()
+        self.accepted = tuple((str(value).casefold(),) for value in self.correct)
+
+
+def question_bank(elements, game: str, question, correct_attr: str | None = None) -> QuestionBank:
+    """Returns the QuestionBank of a game type. It is built on the first call and then shared
+    by every game of that type on the same table."""
+
+    banks = _QUESTION_BANKS.setdefault(elements, {})
+    if game not in banks:
+        banks[game] = QuestionBank(elements, question, correct_attr)
+    return banks[game]
+
 
 class BaseGames:
     """Game blueprint for the base games."""
 
-    def __init__(self, elements, attempts: int, title: str, correct_attr: str, question):
+    def __init__(self, elements, attempts: int, title: str, correct_attr: str, question, tolerance: int = 0, rng=None):
         self.elements = elements
+        self.rng = make_rng(rng) # A random.Random or a seed, so that a game can be replayed
+        self.scheduler = LeitnerScheduler(len(elements)) # Asks more often about what is answered wrong
+        self.on_result = None # Called with (element, correct) for every answer, e.g. for statistics
         self.attempts = attempts
         self.max_attempts = attempts
-        self.current_question = self.elements.random_element()
+        self.current_question = self.elements.get_element(self.scheduler.next(self.rng))
         self.feedback = ""
 
         self.title = title
         self.correct_attr = correct_attr
         self.question = question
+        self.bank = question_bank(elements, type(self).__name__, question, correct_attr)
+
+        # Number of typos that are forgiven, as long as the answer is closest to the right one
+        self.tolerance = tolerance
+        self.matcher = matching.get_matcher(elements, correct_attr) if tolerance else None
 
 
     def _generate_new_question(self):
         self.attempts = self.max_attempts
-        self.current_question = self.elements.random_element()
+        self.current_question = self.elements.get_element(self.scheduler.next(self.rng))
         return self.current_question
 
 
     def get_current_question(self) -> str:
         """Returns the current formatted question"""
 
-        return self.question(self.current_question)
+        return self.bank.prompts[self.current_question.index]
 
 
     def get_question_status(self) -> str:
@@ -38,10 +99,30 @@ class BaseGames:
         return self.feedback
 
 
+    def get_state(self) -> tuple:
+        """Returns the state of the game as a tuple of plain values, see set_state."""
+
+        return (self.current_question.index, self.attempts, self.feedback, self.scheduler.get_state())
+
+
+    def set_state(self, state: tuple) -> None:
+        """Restores a state returned by get_state."""
+
+        index, self.attempts, self.feedback, boxes = state
+        self.current_question = self.elements.get_element(index)
+        self.scheduler.set_state(boxes)
+
+
+    def _report(self, correct: bool) -> None:
+        if self.on_result:
+            self.on_result(self.current_question, correct)
+
+
+    @instrument.timed("games.BaseGames.update")
     def update(self, answer: str) -> None:
         """Updates the game based on the provided answer."""
         # Gets the correct value depending on game
-        correct_value = getattr(self.current_question, self.correct_attr)
+        correct_value = self.bank.correct[self.current_question.index]
 
         # In the answer is supposed to be an int, letters wont count towards attemts
         if isinstance(correct_value, int) and answer != "":
@@ -51,15 +132,30 @@ class BaseGames:
                 self.feedback = "Svaret måste vara en siffra"
                 return
 
-        if str(correct_value).casefold() == str(answer).casefold():
+        index = self.current_question.index
+        if str(answer).casefold() in self.bank.accepted[index]:
             self.feedback = "Rätt!"
+            if self.attempts == self.max_attempts: # Only known if it was right at the first try
+                self.scheduler.correct(index)
+            self._report(True)
+            self._generate_new_question()
+
+        elif self.matcher and self.matcher.closest(str(answer), self.tolerance) == correct_value:
+            self.feedback = f"Rätt! Det stavas {correct_value}"
+            if self.attempts == self.max_attempts:
+                self.scheduler.correct(index)
+            self._report(True)
             self._generate_new_question()
 
         elif self.attempts <= 1: # If no more attempts left
             self.feedback = f"Fel! Rätt svar var: {correct_value}"
+            self.scheduler.wrong(index)
+            self._report(False)
             self._generate_new_question()
 
         else:
+            self.scheduler.wrong(index)
+            self._report(False)
             self.attempts -= 1
             self.feedback = f"Fel, {self.attempts} försök kvar."
 
@@ -67,88 +163,116 @@ class BaseGames:
 class AtnumGame(BaseGames):
     """Game class for atomic number training. Inherits from BaseGame"""
 
-    def __init__(self, elements):
+    def __init__(self, elements, rng=None):
         super().__init__(
             elements,
             attempts=3,
             title = "Träna på atomnummer",
             correct_attr = "atnum",
-            question = lambda q: f"Vilket atomnummer har grundämnet: {q.name}?")
+            question = lambda q: f"Vilket atomnummer har grundämnet: {q.name}?",
+            rng = rng)
 
 
 class NameGame(BaseGames):
     """Game class for name training. Inherits from BaseGame"""
 
-    def __init__(self, elements):
+    def __init__(self, elements, tolerance: int = 0, rng=None):
         super().__init__(
             elements,
             attempts=3,
             title = "Träna på namn",
             correct_attr = "name",
-            question = lambda q: f"Vad heter grundämnet: {q.symbol}?")
+            question = lambda q: f"Vad heter grundämnet: {q.symbol}?",
+            tolerance = tolerance,
+            rng = rng)
 
 
 class SymbolGame(BaseGames):
     """Game class for symbol training. Inherits from BaseGame"""
 
-    def __init__(self, elements):
+    def __init__(self, elements, tolerance: int = 0, rng=None):
         super().__init__(
             elements,
             attempts=3,
             title = "Träna på atombeteckningar",
             correct_attr = "symbol",
-            question = lambda q: f"Vilken atombeteckning har grundämnet: {q.name}?")
+            question = lambda q: f"Vilken atombeteckning har grundämnet: {q.name}?",
+            tolerance = tolerance,
+            rng = rng)
 
 
 class MassGame:
-    """Game class for the mass game."""
+    """Game class for the mass game. Every question has choices answers to choose from."""
 
-    def __init__(self, elements):
+    def __init__(self, elements, prefetch: int = 3, offset_factor: float = 0.125, min_offset: float = 5,
+                 choices: int = 3, rng=None):
         self.elements = elements
+        self.rng = make_rng(rng)
+        self.scheduler = LeitnerScheduler(len(elements))
+        self.on_result = None # Called with (element, correct) for every answer
         self.attempts = None
-        self.current_question = self.elements.random_element()
+        # The decoys are within max(mass*offset_factor, min_offset) of the true mass
+        self.decoy_pools = _decoy_pools(elements, offset_factor, min_offset)
+        most = min(len(candidates) for candidates, _ in self.decoy_pools) # The smallest pool limits every question
+        if not 1 <= choices <= most:
+            raise ValueError(f"MassGame can have 1 to {most} choices with these offsets, not {choices}")
+        self.choices = choices
+        self.bank = question_bank(elements, "MassGame", lambda q: f"Vilken massa har grundämnet {q.name}")
+        self.prefetch_size = prefetch
+        self.upcoming = deque() # Prepared (question, answers) pairs, filled by prefetch
+        self.current_question = None
+        self.answers = []
+        self._generate_new_question()
+        self.prefetch()
         self.feedback = ""
 
 
-    def _generate_mass_question_set(self, question, q_no=3):
+    def _generate_mass_question_set(self, question):
 
-        true_mass = question.mass
-        offset = max(true_mass*0.125, 5) # Adjust dynamically depending on how large mass is
-        lower = max(true_mass-offset, 1) # Cant be negative or zero
-        upper = true_mass+offset
+        # Draws the decoys from the precomputed pool of rounded masses, without replacement
+        candidates, true_rounded = self.decoy_pools[question.index]
+        question_list = [question.mass]
+        # Picks among all candidates except the true one by skipping over it
+        for pick in self.rng.sample(range(len(candidates) - 1), self.choices - 1):
+            decoy = candidates[pick]
+            question_list.append(float(decoy + 1 if decoy >= true_rounded else decoy))
 
-        # Sets can only contain unique elements - duplicates are ruled out.
-        question_set = {true_mass}
-        rounded_set = {round(true_mass)} # Used to ensure that no masses look the same because of rounding
-        while len(rounded_set) < q_no:
+        self.rng.shuffle(question_list)
+        return question_list
 
-            decoy = random.uniform(lower, upper)
-            rounded_decoy = round(decoy)
-            if rounded_decoy not in rounded_set: # Ensure that both sets are in sync
-                rounded_set.add(rounded_decoy)
-                question_set.add(decoy)
 
-        # Convert to list in order to shuffle
-        question_list = list(question_set)
-        random.shuffle(question_list)
-        return question_list
+    def _prepare_question(self) -> tuple:
+        # Prefetched questions are chosen before the answers to the ones before them, so the
+        # scheduler lags behind by up to prefetch questions
+        question = self.elements.get_element(self.scheduler.next(self.rng))
+        return question, self._generate_mass_question_set(question)
 
 
     def _generate_new_question(self):
-        self.current_question = self.elements.random_element()
+        # The answer set is created together with the question, so that it stays the same
+        # no matter how many times it is displayed.
+        self.current_question, self.answers = self.upcoming.popleft() if self.upcoming else self._prepare_question()
         return self.current_question
 
 
+    def prefetch(self) -> None:
+        """Prepares upcoming questions with their answer sets, so that moving on to the
+        next question doesnt have to generate anything. Meant to be called when idle."""
+
+        while len(self.upcoming) < self.prefetch_size:
+            self.upcoming.append(self._prepare_question())
+
+
     def get_current_question(self) -> str:
         """Returns the current formatted question"""
 
-        return f"Vilken massa har grundämnet {self.current_question.name}"
+        return self.bank.prompts[self.current_question.index]
 
 
     def get_answers(self) -> list[float]:
-        """Returns an answer set consisting of 3 choices."""
+        """Returns the answer set of the current question, with self.choices choices."""
 
-        return self._generate_mass_question_set(self.current_question)
+        return self.answers
 
 
     def get_question_status(self) -> str:
@@ -156,6 +280,22 @@ class MassGame:
         return self.feedback
 
 
+    def get_state(self) -> tuple:
+        """Returns the state of the game as a tuple of plain values, see set_state."""
+
+        return (self.current_question.index, tuple(self.answers), self.feedback, self.scheduler.get_state())
+
+
+    def set_state(self, state: tuple) -> None:
+        """Restores a state returned by get_state."""
+
+        index, answers, self.feedback, boxes = state
+        self.current_question = self.elements.get_element(index)
+        self.answers = list(answers)
+        self.scheduler.set_state(boxes)
+
+
+    @instrument.timed("games.MassGame.update")
     def update(self, answer: float) -> None:
         """Updates the game based on the provided answer."""
 
@@ -163,28 +303,72 @@ class MassGame:
 
         if self.current_question.mass == answer:
             self.feedback = "Rätt!"
+            self.scheduler.correct(self.current_question.index)
+            if self.on_result:
+                self.on_result(self.current_question, True)
             self._generate_new_question()
 
         else:
             self.feedback = f"Fel Svar! Rätt svar var {round(correct_value)}"
+            self.scheduler.wrong(self.current_question.index)
+            if self.on_result:
+                self.on_result(self.current_question, False)
             self._generate_new_question()
 
 
+_BOARD_MASKS = weakref.WeakKeyDictionary() # Table -> BoardMasks
+
+
+class BoardMasks:
+    """Bit masks over element indexes, bit i is set for the element with index i. Built once
+    per table, so that filtering a board is a single and."""
+
+    __slots__ = ("all", "periods", "groups", "families")
+
+    def __init__(self, elements):
+        self.all = 0
+        self.periods = {} # Period -> mask
+        self.groups = {} # Group -> mask, elements without group are left out
+        self.families = {} # Family name -> mask
+        for element in elements.get_all_elements():
+            bit = 1 << element.index
+            self.all |= bit
+            self.periods[element.period] = self.periods.get(element.period, 0) | bit
+            if element.group is not None:
+                self.groups[element.group] = self.groups.get(element.group, 0) | bit
+            self.families[element.family] = self.families.get(element.family, 0) | bit
+
+
+def board_masks(elements) -> BoardMasks:
+    """Returns the BoardMasks of the table. They are built on the first call and then shared."""
+
+    if elements not in _BOARD_MASKS:
+        _BOARD_MASKS[elements] = BoardMasks(elements)
+    return _BOARD_MASKS[elements]
+
+
 class PeriodicGame:
-    """Game class for periodic game"""
+    """Game class for periodic game. The board is an int where bit i is set when the element
+    with index i has been placed."""
         
-    def __init__(self, elements):
+    def __init__(self, elements, rng=None):
         self.elements = elements
+        self.rng = make_rng(rng)
         self.attempts = None
-        self.shuffled_elements = self.elements.get_all_elements()
-        random.shuffle(self.shuffled_elements)
+        self.bank = question_bank(elements, "PeriodicGame", lambda q: f"Placera ut: {q.name}")
+        self.masks = board_masks(elements)
+        self.order = self.elements.get_all_indexes() # The order the elements are asked in
+        self.rng.shuffle(self.order)
+        self.position = 0 # Position in order of the current question, the ones before are placed
+        self.placed = 0
+        self.on_result = None # Called with (element, correct) for every answer
         self.current_question = self._generate_new_question()
         self.feedback = ""
 
 
     def _generate_new_question(self):
-        if len(self.shuffled_elements) > 0: # Only gen new question if there is more left
-            self.current_question = self.shuffled_elements.pop(0)
+        if self.position < len(self.order): # Only gen new question if there is more left
+            self.current_question = self.elements.get_element(self.order[self.position])
             return self.current_question
         self.current_question = None
         return self.current_question
@@ -193,7 +377,7 @@ class PeriodicGame:
     def get_current_question(self) -> str:
         """Returns the current formatted question"""
 
-        return f"Placera ut: {self.current_question.name}" if self.current_question else ""
+        return self.bank.prompts[self.current_question.index] if self.current_question else ""
 
 
     def get_question_status(self) -> str:
@@ -202,6 +386,76 @@ class PeriodicGame:
         return self.feedback
 
 
+    def get_board(self) -> int:
+        """Returns the board, bit i is set if the element with index i has been placed.
+        Two boards can be compared with ^, e.g. to see what differs."""
+
+        return self.placed
+
+
+    def get_placed(self) -> list:
+        """Returns the Element objects that have been placed in the table."""
+
+        return [element for element in self.elements.get_all_elements() if self.placed >> element.index & 1]
+
+
+    def progress(self) -> tuple[int, int]:
+        """Returns how many elements have been placed and how many there are."""
+
+        return self.placed.bit_count(), len(self.order)
+
+
+    def remaining(self, period: int | None = None, group: int | None = None, family: str | None = None) -> int:
+        """Returns the mask of the elements that are left to place, optionally only those in
+        a period, group and/or family. Count them with .bit_count()."""
+
+        mask = self.masks.all & ~self.placed
+        if period is not None:
+            mask &= self.masks.periods.get(period, 0)
+        if group is not None:
+            mask &= self.masks.groups.get(group, 0)
+        if family is not None:
+            mask &= self.masks.families.get(family, 0)
+        return mask
+
+
+    def hint(self) -> str:
+        """Returns a hint about where the current element is."""
+
+        if self.current_question is None:
+            return ""
+        period = self.current_question.period
+        left = self.remaining(period=period).bit_count()
+        return f"{self.current_question.name} finns i period {period}, där {left} grundämnen är kvar att placera"
+
+
+    def undo(self):
+        """Takes back the last placed element, which becomes the current question again.
+        Returns the Element, or None if nothing has been placed."""
+
+        if self.position == 0:
+            return None
+        self.position -= 1
+        self.placed &= ~(1 << self.order[self.position])
+        self.feedback = ""
+        return self._generate_new_question()
+
+
+    def get_state(self) -> tuple:
+        """Returns the state of the game as a tuple of plain values, see set_state."""
+
+        return (self.order.tobytes(), self.position, self.placed, self.feedback)
+
+
+    def set_state(self, state: tuple) -> None:
+        """Restores a state returned by get_state."""
+
+        order, self.position, self.placed, self.feedback = state
+        self.order = array(self.order.typecode, order)
+        self._generate_new_question()
+
+
+    @instrument.timed("games.PeriodicGame.update")
     def update(self, answer) -> bool:
         """Updates the game based on the provided answer.
         Returns True to signal that an element is to be shown.
@@ -211,15 +465,15 @@ class PeriodicGame:
             self.feedback = "Grattis! Du klarade det!"
             return False
 
+        if self.on_result:
+            self.on_result(self.current_question, self.current_question.pos == answer.pos)
+
         if self.current_question.pos == answer.pos:
             self.feedback = "Rätt!"
-
-            if self.shuffled_elements:
-                self._generate_new_question()
-            else:
-                self.current_question = None # When last frame is clicked
+            self.placed |= 1 << self.current_question.index
+            self.position += 1
+            if self._generate_new_question() is None: # When last frame is clicked
                 self.feedback = "Grattis! Du klarade det!"
-
             return True
 
         else:
@@ -0,0 +1,108 @@
+"""
+P-uppgift - periodiska systemet
+heatmap-file, counts right and wrong answers per element and turns them into cell colors
+
+The counts are NumPy arrays indexed by atomic number, so that the stats of a whole class can
+be summed and all the colors computed at once instead of element by element. Needs NumPy,
+the GUI works without it but then has no heatmap.
+"""
+
+import os
+import numpy as np
+
+WRONG, RIGHT = 0, 1 # Rows of ErrorStats.counts
+
+# Gradient from no errors to only errors, dark enough for the white text of the cells
+GRADIENT_STOPS = np.array([0.0, 0.5, 1.0])
+GRADIENT_RGB = np.array([
+    (46, 125, 50), # Green
+    (214, 130, 20), # Orange
+    (198, 40, 40)]) # Red
+UNSEEN_RGB = (120, 120, 120) # Elements without any answers
+
+_HEX_DIGITS = np.frombuffer(b"0123456789abcdef", dtype=np.uint8)
+
+
+class ErrorStats:
+    """Number of wrong and right answers per element. counts[WRONG, atnum] and
+    counts[RIGHT, atnum], size is the largest atomic number + 1."""
+
+    def __init__(self, size: int, counts: np.ndarray | None = None):
+        self.counts = np.zeros((2, size), dtype=np.int64) if counts is None else counts
+
+
+    def add(self, atnum: int, correct: bool) -> None:
+        """Counts one answer."""
+
+        self.counts[RIGHT if correct else WRONG, atnum] += 1
+
+
+    def add_many(self, atnums, corrects) -> None:
+        """Counts many answers at once, e.g. from a results store."""
+
+        np.add.at(self.counts, (np.asarray(corrects, dtype=np.intp), np.asarray(atnums, dtype=np.intp)), 1)
+
+
+    def merge(self, other: 'ErrorStats') -> None:
+        """Adds the counts of other, which may be for fewer or more elements."""
+
+        if other.counts.shape[1] > self.counts.shape[1]:
+            self.counts = np.pad(self.counts, ((0, 0), (0, other.counts.shape[1] - self.counts.shape[1])))
+        self.counts[:, :other.counts.shape[1]] += other.counts
+
+
+    def error_rates(self, atnums: np.ndarray) -> np.ndarray:
+        """Returns the share of wrong answers for the atomic numbers, NaN where there are none."""
+
+        wrong = self.counts[WRONG, atnums]
+        total = wrong + self.counts[RIGHT, atnums]
+        return np.divide(wrong, total, out=np.full(len(atnums), np.nan), where=total > 0)
+
+
+    def colors(self, atnums: np.ndarray) -> list[str]:
+        """Returns the heatmap color ("#rrggbb") of every atomic number in atnums, in order."""
+
+        rates = self.error_rates(atnums)
+        seen = ~np.isnan(rates)
+        rgb = np.empty((len(atnums), 3), dtype=np.uint8)
+        for channel in range(3):
+            rgb[:, channel] = np.interp(np.where(seen, rates, 0.0), GRADIENT_STOPS, GRADIENT_RGB[:, channel])
+        rgb[~seen] = UNSEEN_RGB
+
+        # Formats all the colors at once, two hex digits per channel after a "#"
+        chars = np.empty((len(atnums), 7), dtype=np.uint8)
+        chars[:, 0] = ord("#")
+        chars[:, 1::2] = _HEX_DIGITS[rgb >> 4]
+        chars[:, 2::2] = _HEX_DIGITS[rgb & 15]
+        return chars.view("S7").ravel().astype(str).tolist()
+
+
+    def save(self, path: str) -> None:
+        """Writes the counts as a .npy file."""
+
+        with open(path + ".tmp", "wb") as file:
+            np.save(file, self.counts)
+        os.replace(path + ".tmp", path)
+
+
+def load(path: str, size: int) -> ErrorStats:
+    """Reads stats written by ErrorStats.save, or returns empty stats if there is no file.
+    Raises ValueError if the file isnt stats."""
+
+    if not os.path.exists(path):
+        return ErrorStats(size)
+    counts = np.load(path, allow_pickle=False)
+    if counts.ndim != 2 or counts.shape[0] != 2 or counts.dtype.kind not in "iu":
+        raise ValueError(f"{path} innehåller ingen statistik")
+    stats = ErrorStats(size)
+    stats.merge(ErrorStats(counts.shape[1], counts.astype(np.int64)))
+    return stats
+
+
+def load_all(paths, size: int) -> ErrorStats:
+    """Returns the stats of many learners, e.g. a class, added together."""
+
+    total = ErrorStats(size)
+    for path in paths:
+        total.merge(load(path, size))
+    return total
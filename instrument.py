@@ -0,0 +1,177 @@
+"""
+P-uppgift - periodiska systemet
+instrument-file, lightweight timing and counters for finding out where time goes
+
+Turned on with environment variables, which are read when this module is first imported:
+
+    PERIODISKA_STATS=stats.json     collects spans, counters and histograms, dumped on exit
+    PERIODISKA_PROFILE=session.prof runs the whole session under cProfile, dumped on exit
+
+When PERIODISKA_STATS is not set, timed returns the function untouched and span, count and
+observe return at once, so the instrumentation costs close to nothing.
+"""
+
+import atexit
+import math
+import os
+import time
+from functools import wraps
+
+STATS_PATH = os.environ.get("PERIODISKA_STATS")
+PROFILE_PATH = os.environ.get("PERIODISKA_PROFILE")
+ENABLED = bool(STATS_PATH)
+
+_counters = {}
+_histograms = {}
+
+
+class Histogram:
+    """Counts values in buckets that double in size, from 1 us and up. Values are in ms."""
+
+    __slots__ = ("count", "total", "low", "high", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.low = math.inf
+        self.high = 0.0
+        self.buckets = {}
+
+
+    def add(self, value: float) -> None:
+        """Adds one value."""
+
+        self.count += 1
+        self.total += value
+        self.low = min(self.low, value)
+        self.high = max(self.high, value)
+        bucket = max(0, math.ceil(math.log2(value * 1000))) if value > 0 else 0
+        self.buckets[bucket] = self.buckets.get(bucket, 0) + 1
+
+
+    def percentile(self, fraction: float) -> float:
+        """Returns the upper limit of the bucket the percentile falls in."""
+
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= fraction * self.count:
+                return min(2 ** bucket / 1000, self.high)
+        return self.high
+
+
+    def summary(self) -> dict:
+        """Returns the histogram as a dict for the JSON dump."""
+
+        return {
+            "count": self.count,
+            "total_ms": self.total,
+            "mean_ms": self.total / self.count if self.count else 0.0,
+            "min_ms": self.low if self.count else 0.0,
+            "p50_ms": self.percentile(0.5),
+            "p99_ms": self.percentile(0.99),
+            "max_ms": self.high,
+        }
+
+
+class _NoSpan:
+    # Returned by span when disabled, entering and leaving does nothing
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *_):
+        return False
+
+
+_NO_SPAN = _NoSpan()
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name: str):
+        self.name = name
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *_):
+        observe(self.name, (time.perf_counter() - self.start) * 1000)
+        return False
+
+
+def span(name: str):
+    """Context manager that times the block into the histogram name (in ms)."""
+
+    return _Span(name) if ENABLED else _NO_SPAN
+
+
+def timed(name: str):
+    """Decorator that times every call of the function into the histogram name."""
+
+    def decorator(function):
+        if not ENABLED: # No wrapper at all when disabled
+            return function
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                observe(name, (time.perf_counter() - start) * 1000)
+        return wrapper
+    return decorator
+
+
+def count(name: str, amount: int = 1) -> None:
+    """Increases the counter name."""
+
+    if ENABLED:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def observe(name: str, value: float) -> None:
+    """Adds a value to the histogram name."""
+
+    if ENABLED:
+        histogram = _histograms.get(name)
+        if histogram is None:
+            histogram = _histograms[name] = Histogram()
+        histogram.add(value)
+
+
+def stats() -> dict:
+    """Returns everything collected so far."""
+
+    return {
+        "counters": dict(sorted(_counters.items())),
+        "histograms": {name: _histograms[name].summary() for name in sorted(_histograms)},
+    }
+
+
+def dump(path: str) -> None:
+    """Writes the collected stats as JSON."""
+
+    import json # Only needed at exit, kept out of the import time of the games
+
+    with open(path, "w", encoding="utf-8") as file:
+        json.dump(stats(), file, indent=2)
+
+
+if ENABLED:
+    atexit.register(lambda: dump(STATS_PATH))
+
+if PROFILE_PATH:
+    import cProfile
+    _profiler = cProfile.Profile()
+    _profiler.enable()
+
+    def _dump_profile():
+        _profiler.disable()
+        _profiler.dump_stats(PROFILE_PATH)
+    atexit.register(_dump_profile)
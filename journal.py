@@ -0,0 +1,212 @@
+"""
+P-uppgift - periodiska systemet
+journal-file, saves the progress of a game so that it can be resumed
+
+A session is stored as two files. The snapshot (.snap) holds the whole state of the game,
+the journal (.log) holds every answer given after the snapshot. Resuming loads the snapshot
+and replays the answers in the journal. When the journal has grown long enough it is
+compacted into a new snapshot. The snapshot can also hold a small dict of info about the
+session that isnt part of the game, e.g. its id in the results store.
+"""
+
+import marshal
+import os
+import struct
+import zlib
+import games
+
+SNAPSHOT_VERSION = 4
+
+# Every record in the journal: payload length, crc32 of the payload, then the payload
+RECORD_HEADER = struct.Struct("<II")
+
+
+def encode_answer(game, answer):
+    """Returns the answer as a plain value that can be stored. The periodic game is answered
+    with Element objects, those are stored as their index."""
+
+    return answer.index if isinstance(game, games.PeriodicGame) else answer
+
+
+def decode_answer(game, encoded):
+    """Returns the answer stored by encode_answer."""
+
+    return game.elements.get_element(encoded) if isinstance(game, games.PeriodicGame) else encoded
+
+
+def _table_key(elements) -> tuple:
+    # Identifies the table the snapshot was made from, the state holds indexes into it
+    symbols = " ".join(element.symbol for element in elements.get_all_elements())
+    return (len(elements), zlib.crc32(symbols.encode()))
+
+
+def _question_of(game) -> tuple:
+    # The part of the state that is chosen at random after an answer, and can't be replayed
+    if isinstance(game, games.MassGame):
+        return (game.current_question.index, tuple(game.answers))
+    if isinstance(game, games.PeriodicGame): # The order is already in the snapshot
+        return ()
+    return (game.current_question.index,)
+
+
+def _set_question(game, question: tuple) -> None:
+    if not question:
+        return
+    game.current_question = game.elements.get_element(question[0])
+    if isinstance(game, games.MassGame):
+        game.answers = list(question[1])
+
+
+class SessionJournal:
+    """Persists one game session at path (without file extension).
+    Answers are only buffered by record, they are written with one fsync when flush is called,
+    so that the disk is never waited for while answering."""
+
+    def __init__(self, path: str, elements, compact_every: int = 256):
+        self.snapshot_path = path + ".snap"
+        self.journal_path = path + ".log"
+        self.elements = elements
+        self.table_key = _table_key(elements)
+        self.compact_every = compact_every
+
+        self.game = None
+        self.info = {} # Stored in the snapshot together with the game
+        self.seq = 0 # Number of answers given in the session
+        self.snapshot_seq = 0 # Number of answers included in the snapshot
+        self._buffer = bytearray()
+        self._file = None
+
+
+    def start(self, game, info: dict | None = None) -> None:
+        """Starts journaling a new game, replacing any earlier session. Also works for a
+        resumed game, e.g. to store new info, the snapshot then holds the state so far."""
+
+        self.game = game
+        self.info = info or {}
+        self.seq = 0
+        self._compact()
+
+
+    def resume(self, game_class, **options):
+        """Returns the game restored from disk, or None if there is nothing to resume, or the
+        session was played with another element file. options are given to game_class, e.g.
+        tolerance, they arent part of the snapshot."""
+
+        try:
+            with open(self.snapshot_path, "rb") as file:
+                snapshot = marshal.loads(file.read())
+        except (OSError, EOFError, ValueError, TypeError):
+            return None
+        if not isinstance(snapshot, dict) or snapshot.get("version") != SNAPSHOT_VERSION \
+                or snapshot.get("game") != game_class.__name__ or snapshot.get("table") != self.table_key:
+            return None
+
+        game = game_class(self.elements, **options)
+        seq = snapshot["seq"]
+        try:
+            game.set_state(snapshot["state"])
+            for record_seq, answer, question in self._read_journal():
+                if record_seq <= seq: # Already part of the snapshot
+                    continue
+                game.update(decode_answer(game, answer))
+                _set_question(game, question)
+                seq = record_seq
+        except (IndexError, KeyError, ValueError, TypeError): # Doesnt fit the table, e.g. a file of another version
+            return None
+        self.game = game
+        self.info = snapshot["info"]
+        self.seq = self.snapshot_seq = seq
+
+        self._compact() # Also drops a torn record, so that new records are appended after valid ones
+        return game
+
+
+    def _read_journal(self):
+        # Yields every complete record, a torn record at the end (from a crash) is ignored
+        try:
+            with open(self.journal_path, "rb") as file:
+                data = file.read()
+        except OSError:
+            return
+
+        offset = 0
+        while offset + RECORD_HEADER.size <= len(data):
+            length, crc = RECORD_HEADER.unpack_from(data, offset)
+            payload = data[offset + RECORD_HEADER.size:offset + RECORD_HEADER.size + length]
+            if len(payload) != length or zlib.crc32(payload) != crc:
+                return
+            yield marshal.loads(payload)
+            offset += RECORD_HEADER.size + length
+
+
+    def _open_journal(self) -> None:
+        if self._file is None:
+            self._file = open(self.journal_path, "ab")
+
+
+    def record(self, answer) -> None:
+        """Records an answer that has just been given to the game with update. It is only
+        buffered, and written by the next flush."""
+
+        self.seq += 1
+        payload = marshal.dumps((self.seq, encode_answer(self.game, answer), _question_of(self.game)))
+        self._buffer += RECORD_HEADER.pack(len(payload), zlib.crc32(payload)) + payload
+
+
+    def flush(self) -> None:
+        """Writes the buffered answers to disk. Compacts the journal when it is long enough."""
+
+        if self._buffer:
+            self._open_journal()
+            self._file.write(self._buffer)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._buffer.clear()
+
+        if self.seq - self.snapshot_seq >= self.compact_every:
+            self._compact()
+
+
+    def _compact(self) -> None:
+        # Writes a new snapshot of the whole game and empties the journal. The snapshot is
+        # replaced atomically, and records it already covers are skipped on resume, so a
+        # crash in between loses nothing.
+        snapshot = {
+            "version": SNAPSHOT_VERSION,
+            "game": type(self.game).__name__,
+            "table": self.table_key,
+            "seq": self.seq,
+            "state": self.game.get_state(),
+            "info": self.info}
+        with open(self.snapshot_path + ".tmp", "wb") as file:
+            marshal.dump(snapshot, file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(self.snapshot_path + ".tmp", self.snapshot_path)
+        self.snapshot_seq = self.seq
+
+        if self._file:
+            self._file.close()
+        self._file = open(self.journal_path, "wb") # Truncates the journal
+        self._buffer.clear()
+
+
+    def close(self) -> None:
+        """Flushes and closes the journal, the session can be resumed later."""
+
+        self.flush()
+        if self._file:
+            self._file.close()
+            self._file = None
+
+
+    def discard(self) -> None:
+        """Closes the journal and deletes the session from disk."""
+
+        if self._file:
+            self._file.close()
+            self._file = None
+        self._buffer.clear()
+        for path in (self.snapshot_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
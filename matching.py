@@ -0,0 +1,137 @@
+"""
+P-uppgift - periodiska systemet
+matching-file, type-ahead and typo tolerant matching of element names and symbols
+
+The indexes are built once per PeriodicTable and attribute, so that each keystroke only
+has to walk the prefix in the trie instead of looking through every element.
+"""
+
+import weakref
+
+SUGGESTION_LIMIT = 8 # Completions stored in each trie node
+
+_MATCHERS = weakref.WeakKeyDictionary() # PeriodicTable -> {attribute: Matcher}
+
+
+def edit_distance(a: str, b: str) -> int:
+    """Returns the Levenshtein distance between a and b."""
+
+    if len(a) < len(b):
+        a, b = b, a
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1, # Deletion
+                current[j-1] + 1, # Insertion
+                previous[j-1] + (char_a != char_b))) # Substitution
+        previous = current
+    return previous[-1]
+
+
+class PrefixTrie:
+    """A trie where every node keeps its first completions, so a lookup is O(len(prefix))."""
+
+    def __init__(self, words):
+        self.root = {"children": {}, "completions": []}
+        # Inserted in sorted order, then the first completions of a node are the first words
+        for word in sorted(words, key=str.casefold):
+            node = self.root
+            for char in word.casefold():
+                node = node["children"].setdefault(char, {"children": {}, "completions": []})
+                if len(node["completions"]) < SUGGESTION_LIMIT:
+                    node["completions"].append(word)
+
+
+    def complete(self, prefix: str, limit: int = SUGGESTION_LIMIT) -> list[str]:
+        """Returns up to limit words starting with prefix (case insensitive), sorted."""
+
+        node = self.root
+        for char in prefix.casefold():
+            node = node["children"].get(char)
+            if node is None:
+                return []
+        return node["completions"][:limit]
+
+
+class BKTree:
+    """A BK-tree over words, finds the words within an edit distance without comparing
+    against every word."""
+
+    def __init__(self, words):
+        self.root = None
+        for word in words:
+            self._add(word)
+
+
+    def _add(self, word: str) -> None:
+        key = word.casefold()
+        if self.root is None:
+            self.root = (key, word, {})
+            return
+
+        node = self.root
+        while True:
+            distance = edit_distance(key, node[0])
+            if distance == 0: # Already in the tree
+                return
+            if distance not in node[2]:
+                node[2][distance] = (key, word, {})
+                return
+            node = node[2][distance]
+
+
+    def search(self, query: str, max_distance: int) -> list[tuple[int, str]]:
+        """Returns (distance, word) for every word within max_distance of query, closest first."""
+
+        if self.root is None:
+            return []
+
+        query = query.casefold()
+        found = []
+        stack = [self.root]
+        while stack:
+            key, word, children = stack.pop()
+            distance = edit_distance(query, key)
+            if distance <= max_distance:
+                found.append((distance, word))
+            # By the triangle inequality only these children can be close enough
+            for child_distance, child in children.items():
+                if distance - max_distance <= child_distance <= distance + max_distance:
+                    stack.append(child)
+        return sorted(found)
+
+
+class Matcher:
+    """Suggestions and typo tolerant matching for one attribute, e.g. name, of all elements."""
+
+    def __init__(self, words):
+        self.trie = PrefixTrie(words)
+        self.tree = BKTree(words)
+
+
+    def suggest(self, prefix: str, limit: int = 5) -> list[str]:
+        """Returns the words that start with prefix, an empty prefix gives no suggestions."""
+
+        return self.trie.complete(prefix, limit) if prefix else []
+
+
+    def closest(self, answer: str, max_distance: int) -> str | None:
+        """Returns the only word closest to answer within max_distance.
+        Returns None if there is none, or if two words are equally close."""
+
+        found = self.tree.search(answer, max_distance)
+        if not found or (len(found) > 1 and found[0][0] == found[1][0]):
+            return None
+        return found[0][1]
+
+
+def get_matcher(elements, attr: str) -> Matcher:
+    """Returns the Matcher for an attribute (name or symbol) of the elements.
+    It is built on the first call and then shared."""
+
+    matchers = _MATCHERS.setdefault(elements, {})
+    if attr not in matchers:
+        matchers[attr] = Matcher([getattr(element, attr) for element in elements.get_all_elements()])
+    return matchers[attr]
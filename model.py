@@ -0,0 +1,389 @@
+"""
+P-uppgift - periodiska systemet
+model-file, the element data without any GUI
+"""
+
+from array import array
+import marshal
+import random
+import sys
+import os
+
+FILE_PATH = "elements.txt"
+CACHE_PATH = "elements.cache" # Compiled version of FILE_PATH, rebuilt when FILE_PATH changes
+CACHE_VERSION = 3
+
+COLORS = {
+    "Alkali_metals": "#DB2E2E",
+    "Alkaline_earth_metals": "#DB8A2E",
+    "Lanthanides": "#CA2EDB",
+    "Actinides": "#8A2EDB",
+    "Transition_metals": "#2E68DB",
+    "Poor_metals": "#2E34DB",
+    "Metalloids": "#25666B",
+    "Nonmetals": "#2EDB93",
+    "Halogens": "#34DB2E",
+    "Noble_gases": "#2ED5DB",
+    "Other": "#4F4F4F"
+}
+
+BG_COLORS = {
+    "Alkali_metals": "#f3a5a5",
+    "Alkaline_earth_metals": "#f3cfa5",
+    "Lanthanides": "#edb5f3",
+    "Actinides": "#d5b5f3",
+    "Transition_metals": "#a5bdf3",
+    "Poor_metals": "#a5aef3",
+    "Metalloids": "#92bdc3",
+    "Nonmetals": "#a5f3ce",
+    "Halogens": "#b0f3a5",
+    "Noble_gases": "#a5f0f3",
+    "Other": "#c4c4c4"
+}
+
+
+FAMILIES = tuple(COLORS) # Families are stored as an index into this tuple
+
+# Numeric columns of the PeriodicTable and their array typecodes
+NUMERIC_COLUMNS = (
+    ("atnums", "H"),
+    ("masses", "d"),
+    ("periods", "B"),
+    ("groups", "B"), # 0 means that the element has no group
+    ("families", "B"),
+    ("rows", "B"),
+    ("cols", "B"))
+
+
+class Element:
+    """Represents an individual element. A lightweight view of one row in a PeriodicTable."""
+
+    __slots__ = ("_table", "index")
+
+    def __init__(self, table: 'PeriodicTable', index: int):
+        self._table = table
+        self.index = index
+
+    @property
+    def symbol(self) -> str:
+        return self._table._symbols[self.index]
+
+    @property
+    def atnum(self) -> int:
+        return self._table._atnums[self.index]
+
+    @property
+    def name(self) -> str:
+        return self._table._names[self.index]
+
+    @property
+    def mass(self) -> float:
+        return self._table._masses[self.index]
+
+    @property
+    def period(self) -> int:
+        return self._table._periods[self.index]
+
+    @property
+    def group(self) -> int | None:
+        return self._table._groups[self.index] or None
+
+    @property
+    def family(self) -> str:
+        return FAMILIES[self._table._families[self.index]]
+
+    @property
+    def color(self) -> str:
+        return COLORS[self.family]
+
+    @property
+    def bg_color(self) -> str:
+        return BG_COLORS[self.family]
+
+    @property
+    def pos(self) -> tuple[int, int]:
+        return (self._table._rows[self.index], self._table._cols[self.index])
+
+    def get(self, column: str):
+        """Returns the value of an optional column of the schema, see ELEMENT_SCHEMA."""
+        return self._table._extra[column][self.index]
+
+
+def _grid_pos(atnum: int, period: int, group: int | None) -> tuple[int, int]:
+    # Special positions on grid according to how the periodic table looks.
+    if 57 <= atnum <= 71:
+        return (period+2, atnum-53)
+    if 89 <= atnum <= 103:
+        return (period+2, atnum-85)
+    return (period, group)
+
+
+def make_rng(rng: random.Random | int | None = None) -> random.Random:
+    """Returns rng if it is a random.Random, otherwise a new one seeded with rng (an int,
+    or None for a seed from the OS)."""
+
+    return rng if isinstance(rng, random.Random) else random.Random(rng)
+
+
+class LoadError(ValueError):
+    """A row in a data file that could not be loaded. line_no is 1 for the first line, or
+    None when the error is about the whole file."""
+
+    def __init__(self, line_no: int | None, message: str):
+        super().__init__(message if line_no is None else f"rad {line_no}: {message}")
+        self.line_no = line_no
+        self.message = message
+
+
+def _parse_group(text: str) -> int | None:
+    return None if text == "None" else int(text)
+
+
+def _parse_family(text: str) -> int:
+    if text not in FAMILIES:
+        raise ValueError("okänd familj")
+    return FAMILIES.index(text)
+
+
+# The columns of an element file, in order, with a function that converts the text. A schema
+# can add optional columns after these as (name, convert, default), e.g. names in other
+# languages with ELEMENT_SCHEMA + (("name_en", str, None),), read with Element.get("name_en")
+ELEMENT_SCHEMA = (
+    ("symbol", str),
+    ("atnum", int),
+    ("name", str),
+    ("mass", float),
+    ("period", int),
+    ("group", _parse_group),
+    ("family", _parse_family))
+
+
+def _convert_row(fields: list[str], schema) -> tuple:
+    required = sum(len(column) == 2 for column in schema) # Optional columns have a default
+    if not required <= len(fields) <= len(schema):
+        expected = str(required) if required == len(schema) else f"{required}-{len(schema)}"
+        raise ValueError(f"{expected} kolumner förväntades men raden har {len(fields)}")
+
+    values = []
+    for (name, convert, *_), field in zip(schema, fields):
+        try:
+            values.append(convert(field))
+        except ValueError as error:
+            detail = f" ({error})" if convert not in (int, float) else ""
+            raise ValueError(f"ogiltigt värde för {name}: {field!r}{detail}") from None
+    values.extend(column[2] for column in schema[len(fields):])
+    return tuple(values)
+
+
+def iter_rows(lines, schema=ELEMENT_SCHEMA, errors: list | None = None):
+    """Reads rows one line at a time and yields (line_no, values) converted by the schema.
+    Empty lines and lines starting with # are skipped. A bad row raises LoadError, unless
+    an errors list is given, then the LoadError is added to it and the row is skipped."""
+
+    for line_no, line in enumerate(lines, 1):
+        fields = line.split()
+        if not fields or fields[0].startswith("#"):
+            continue
+        try:
+            values = _convert_row(fields, schema)
+        except ValueError as error:
+            if errors is None:
+                raise LoadError(line_no, str(error)) from None
+            errors.append(LoadError(line_no, str(error)))
+            continue
+        yield line_no, values
+
+
+def _parse_columns(lines, errors: list | None = None, schema=ELEMENT_SCHEMA) -> dict:
+    rows = []
+    seen = set() # Atomic numbers, which must be unique
+    for line_no, row in iter_rows(lines, schema, errors):
+        if row[1] in seen:
+            error = LoadError(line_no, f"atomnummer {row[1]} finns redan")
+            if errors is None:
+                raise error
+            errors.append(error)
+            continue
+        seen.add(row[1])
+        rows.append(row)
+
+    if not rows:
+        raise LoadError(None, "filen innehåller inga grundämnen")
+    rows.sort(key=lambda row: row[1]) # Sorts elements by atomic number.
+
+    columns = {"symbols": [], "names": []}
+    columns["extra"] = {column[0]: [row[i] for row in rows] for i, column in enumerate(schema) if i >= len(ELEMENT_SCHEMA)}
+    numeric = {name: array(typecode) for name, typecode in NUMERIC_COLUMNS}
+    for symbol, atnum, name, mass, period, group, family, *_ in rows:
+        columns["symbols"].append(symbol)
+        columns["names"].append(name)
+        numeric["atnums"].append(atnum)
+        numeric["masses"].append(mass)
+        numeric["periods"].append(period)
+        numeric["groups"].append(group or 0)
+        numeric["families"].append(family)
+        row, col = _grid_pos(atnum, period, group)
+        numeric["rows"].append(row)
+        numeric["cols"].append(col or 0)
+
+    # Stored as raw bytes so the cache can be loaded without any conversion
+    columns.update((name, column.tobytes()) for name, column in numeric.items())
+    return columns
+
+
+def _cache_path(path: str) -> str:
+    return os.path.splitext(path)[0] + ".cache"
+
+
+def _read_cache(cache_path: str) -> dict | None:
+    try:
+        with open(cache_path, "rb") as file:
+            cache = marshal.loads(file.read())
+        return cache if isinstance(cache, dict) and cache.get("version") == CACHE_VERSION else None
+    except (OSError, EOFError, ValueError, TypeError): # Missing or broken cache is just rebuilt
+        return None
+
+
+def _write_cache(cache_path: str, cache: dict) -> None:
+    try:
+        # Write to a temporary file first so that a crash cant leave a half written cache
+        with open(cache_path + ".tmp", "wb") as file:
+            marshal.dump(cache, file)
+        os.replace(cache_path + ".tmp", cache_path)
+    except OSError: # E.g. read only storage, the game works without the cache
+        pass
+
+
+class PeriodicTable:
+    """Handles access to Elements. Load elements from a specified file, with the columns
+    given by schema. The element data is stored column wise, Element objects are views into the columns."""
+
+    def __init__(self, path: str = FILE_PATH, skip_errors: bool = False, rng: random.Random | int | None = None,
+                 schema=ELEMENT_SCHEMA):
+
+        if schema[:len(ELEMENT_SCHEMA)] != ELEMENT_SCHEMA:
+            raise ValueError("schema must start with the columns of ELEMENT_SCHEMA")
+        self.rng = make_rng(rng)
+        self.schema = schema
+
+        # With skip_errors bad rows are skipped and collected here, otherwise they stop the loading
+        self.load_errors = []
+
+        try:
+            columns = self._load_columns(path, self.load_errors if skip_errors else None)
+        except FileNotFoundError:
+            print("FEL! Ingen fil hittades")
+            sys.exit()
+        except LoadError as error: # Catches errors with creation of element instances
+            print(f"FEL! Filen med grundämnen är felformatterad, {error}")
+            sys.exit()
+        except UnicodeDecodeError:
+            print("FEL! Filen med grundämnen är inte i UTF-8")
+            sys.exit()
+
+        self._symbols = columns["symbols"]
+        self._names = columns["names"]
+        self._extra = columns["extra"]
+        for name, typecode in NUMERIC_COLUMNS:
+            setattr(self, f"_{name}", array(typecode, columns[name]))
+
+        self._elements = [Element(self, index) for index in range(len(self._symbols))]
+        self._build_indexes()
+
+
+    def _load_columns(self, path: str, errors: list | None) -> dict:
+        # Returns the element columns sorted by atomic number. Uses the compiled cache when it
+        # is up to date with the file, so that the text file doesnt have to be parsed again.
+        stat = os.stat(path)
+        cache_path = _cache_path(path)
+        cache = _read_cache(cache_path)
+
+        columns_key = tuple(column[0] for column in self.schema)
+        if cache and cache["schema"] != columns_key: # Read with other optional columns
+            cache = None
+        if cache and (cache["mtime_ns"], cache["size"]) == (stat.st_mtime_ns, stat.st_size):
+            return cache["columns"]
+
+        import hashlib # Only needed when the cache is stale, so it is kept out of the import time
+
+        digest = hashlib.sha256()
+        with open(path, "rb") as file:
+            for chunk in iter(lambda: file.read(1 << 16), b""):
+                digest.update(chunk)
+        digest = digest.hexdigest()
+
+        # The file has been touched but not changed, only the cache key needs updating
+        if cache and cache["sha256"] == digest:
+            columns = cache["columns"]
+        else:
+            with open(path, encoding="utf-8") as file:
+                columns = _parse_columns(file, errors, self.schema)
+
+        if not errors: # Skipped rows should be reported every time, so that isnt cached
+            _write_cache(cache_path, {
+                "version": CACHE_VERSION,
+                "mtime_ns": stat.st_mtime_ns,
+                "size": stat.st_size,
+                "sha256": digest,
+                "schema": columns_key,
+                "columns": columns})
+        return columns
+
+
+    def _build_indexes(self):
+        # Hash indexes so that lookups dont have to walk through every element
+        self._by_pos = {element.pos: element for element in self._elements}
+        self._by_atnum = {element.atnum: element for element in self._elements}
+        self._by_symbol = {element.symbol.casefold(): element for element in self._elements}
+        self._by_name = {element.name.casefold(): element for element in self._elements}
+
+
+    def lookup_by_pos(self, query: tuple[int, int]) -> Element | None:
+        """Returns an Element object if query is matched with the elements position.
+        Otherwise, returns None."""
+
+        return self._by_pos.get(query)
+
+
+    def lookup_by_atnum(self, query: int) -> Element | None:
+        """Returns the Element with the given atomic number. Otherwise, returns None."""
+
+        return self._by_atnum.get(query)
+
+
+    def lookup_by_symbol(self, query: str) -> Element | None:
+        """Returns the Element with the given symbol (case insensitive). Otherwise, returns None."""
+
+        return self._by_symbol.get(query.casefold())
+
+
+    def lookup_by_name(self, query: str) -> Element | None:
+        """Returns the Element with the given name (case insensitive). Otherwise, returns None."""
+
+        return self._by_name.get(query.casefold())
+
+
+    def random_element(self, rng: random.Random | None = None) -> Element:
+        """Returns a random Element object, drawn with rng or else the tables own generator."""
+        return (rng or self.rng).choice(self._elements)
+
+
+    def get_element(self, index: int) -> Element:
+        """Returns the Element at the specified index. Index 0 is the lowest atomic number."""
+        return self._elements[index]
+
+
+    def get_all_elements(self) -> list[Element]:
+        """Returns a copy of all Element objects."""
+        return self._elements.copy()
+
+
+    def get_all_indexes(self) -> array:
+        """Returns a new compact array with the index of every element, with the smallest
+        typecode that fits the number of elements."""
+        typecode = "B" if len(self._elements) <= 256 else "H" if len(self._elements) <= 65536 else "I"
+        return array(typecode, range(len(self._elements)))
+
+
+    def __len__(self) -> int:
+        return len(self._elements)
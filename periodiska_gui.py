@@ -4,108 +4,38 @@ main-file
 """
 
 import tkinter as tk
-import random
+import tkinter.font as tkfont
+import os
+import sqlite3
 import sys
+import time
 import games
+import instrument
+import journal
+import replay
+import results
+import matching
+from model import FILE_PATH, COLORS, BG_COLORS, Element, PeriodicTable # Re-exported, they used to live here
 
-FILE_PATH = "elements.txt"
-
-COLORS = {
-    "Alkali_metals": "#DB2E2E",
-    "Alkaline_earth_metals": "#DB8A2E",
-    "Lanthanides": "#CA2EDB",
-    "Actinides": "#8A2EDB",
-    "Transition_metals": "#2E68DB",
-    "Poor_metals": "#2E34DB",
-    "Metalloids": "#25666B",
-    "Nonmetals": "#2EDB93",
-    "Halogens": "#34DB2E",
-    "Noble_gases": "#2ED5DB",
-    "Other": "#4F4F4F"
-}
-
-BG_COLORS = {
-    "Alkali_metals": "#f3a5a5",
-    "Alkaline_earth_metals": "#f3cfa5",
-    "Lanthanides": "#edb5f3",
-    "Actinides": "#d5b5f3",
-    "Transition_metals": "#a5bdf3",
-    "Poor_metals": "#a5aef3",
-    "Metalloids": "#92bdc3",
-    "Nonmetals": "#a5f3ce",
-    "Halogens": "#b0f3a5",
-    "Noble_gases": "#a5f0f3",
-    "Other": "#c4c4c4"
-}
-
-
-class Element:
-    """Represents an individual element. Stores all required information."""
-
-    def __init__(self, symbol: str, atnum: str, name: str, mass: str, period: str, group: str, family: str):
-        self.symbol = symbol
-        self.atnum = int(atnum)
-        self.name = name
-        self.mass = float(mass)
-        self.period = int(period)
-        self.group = int(group) if group.isdigit() else None
-        self.color = COLORS[family]
-        self.bg_color = BG_COLORS[family]
-
-        # Special positions on grid according to how the periodic table looks.
-        if 57 <= self.atnum <= 71:
-            self.pos = (self.period+2, self.atnum-53)
-        elif 89 <= self.atnum <= 103:
-            self.pos = (self.period+2, self.atnum-85)
-        else:
-            self.pos = (self.period, self.group)
-
-
-class PeriodicTable:
-    """Handles access to Elements. Load elements from a specified file."""
-
-    def __init__(self):
-
-        self._elements = []
-
-        try:
-            with open(FILE_PATH, encoding="utf-8") as file:
-                lines = file.readlines()
-
-                if len(lines) != 103: # In case the file has more/less elements
-                    raise TypeError
-
-                for line in lines:
-                    line = line.split() # Splits each line into a list of element properties
-                    self._elements.append(Element(*line)) # Creates a class instance for each element
-
-                self._elements.sort(key=lambda x: x.atnum) # Sorts elements by atomic number.
-        except FileNotFoundError:
-            print("FEL! Ingen fil hittades")
-            sys.exit()
-        except TypeError: # Catches errors with creation of element instances
-            print("FEL! Filen men grundämnen är felformatterad")
-            sys.exit()
+JOURNAL_DIR = "sessions" # Unfinished games are saved here so that they can be resumed
+JOURNAL_FLUSH_MS = 2000
+RECORD_DIR = os.environ.get("PERIODISKA_RECORD") # Games are recorded here for replay.py when set
+ERROR_STATS_PATH = os.path.join(JOURNAL_DIR, "errors.npy") # Right and wrong answers per element
+RESULTS_PATH = os.path.join(JOURNAL_DIR, "results.sqlite3") # Every answer and game, for the leaderboard
+USER = os.environ.get("PERIODISKA_USER") or os.environ.get("USER") or os.environ.get("USERNAME") or "elev"
 
+_FONTS = {}
 
-    def lookup_by_pos(self, query: tuple[int, int]) -> Element | None:
-        """Returns an Element object if query is matched with the elements position.
-        Otherwise, returns None."""
 
-        for element in self._elements:
-            if query == element.pos:
-                return element
-        return None
+def table_fonts() -> dict[str, tkfont.Font]:
+    """Returns the fonts used in the periodic table. They are created once, on first use,
+    and then shared by every cell."""
 
-
-    def random_element(self) -> Element:
-        """Returns a random Element object."""
-        return random.choice(self._elements)
-
-
-    def get_all_elements(self) -> list[Element]:
-        """Returns a copy of all Element objects."""
-        return self._elements.copy()
+    if not _FONTS:
+        _FONTS["symbol"] = tkfont.Font(family="Arial", size=28, weight="bold")
+        _FONTS["atnum"] = tkfont.Font(family="Arial", size=18)
+        _FONTS["mass"] = tkfont.Font(family="Arial", size=10)
+    return _FONTS
 
 
 class Table:
@@ -117,7 +47,9 @@ class Table:
         self.rows = rows
         self.cols = cols
         self.cells = {}
+        self.shown = {} # Cell -> whether it is currently revealed, so unchanged cells can be skipped
         self.elements = elements
+        self.fonts = table_fonts()
 
         self.periodic_table_frame = tk.Frame(self.table_frame)
         self.periodic_table_frame.grid()
@@ -155,18 +87,24 @@ class Table:
                             "mass": mass_label}}
 
 
+    @instrument.timed("Table.show_element")
     def show_element(self, cell: tuple) -> None:
         """Reveals an element in the periodic table that corresponds with the specified cell."""
 
+        if self.shown.get(cell) is True: # Already revealed
+            return
+        self.shown[cell] = True
+
         cell_data = self.cells[cell]
         element_data = cell_data["element_data"]
         # Modifies each frame and label to show text and switch to regular color.
         cell_data["frame"].config(bg=element_data.color)
-        cell_data["labels"]["symbol"].config(text=element_data.symbol, anchor="nw", font=("Arial", 28, "bold"), fg="white", bg=element_data.color)
-        cell_data["labels"]["atnum"].config(text=element_data.atnum, font=("Arial", 18), fg="white", bg=element_data.color)
-        cell_data["labels"]["mass"].config(text=round(element_data.mass), font=("Arial", 10), fg="white", bg=element_data.color)
+        cell_data["labels"]["symbol"].config(text=element_data.symbol, anchor="nw", font=self.fonts["symbol"], fg="white", bg=element_data.color)
+        cell_data["labels"]["atnum"].config(text=element_data.atnum, font=self.fonts["atnum"], fg="white", bg=element_data.color)
+        cell_data["labels"]["mass"].config(text=round(element_data.mass), font=self.fonts["mass"], fg="white", bg=element_data.color)
 
 
+    @instrument.timed("Table.show_periodic_table")
     def show_periodic_table(self) -> None:
         """Reveals the whole periodic table"""
 
@@ -177,6 +115,10 @@ class Table:
     def hide_element(self, cell: tuple) -> None:
         """Hides an element in the periodic table that corresponds with the specified cell."""
 
+        if self.shown.get(cell) is False: # Already hidden
+            return
+        self.shown[cell] = False
+
         cell_data = self.cells[cell]
         element_data = cell_data["element_data"]
         # Modifies each frame and label to hide text and switch to 'the light' color
@@ -185,6 +127,7 @@ class Table:
         cell_data["labels"]["atnum"].config(text="", bg=element_data.bg_color)
         cell_data["labels"]["mass"].config(text="", bg=element_data.bg_color)
 
+    @instrument.timed("Table.clear_periodic_table")
     def clear_periodic_table(self) -> None:
         """Clears the whole periodic table."""
 
@@ -192,9 +135,141 @@ class Table:
             self.hide_element(cell)
 
 
+    @instrument.timed("Table.show_heatmap")
+    def show_heatmap(self, colors: list[str]) -> None:
+        """Reveals every element in its heatmap color. colors is indexed by element index."""
+
+        for cell, cell_data in self.cells.items():
+            element_data = cell_data["element_data"]
+            color = colors[element_data.index]
+            self.shown[cell] = None # Neither revealed nor hidden, both redraw the cell
+            cell_data["frame"].config(bg=color)
+            cell_data["labels"]["symbol"].config(text=element_data.symbol, anchor="nw", font=self.fonts["symbol"], fg="white", bg=color)
+            cell_data["labels"]["atnum"].config(text=element_data.atnum, font=self.fonts["atnum"], fg="white", bg=color)
+            cell_data["labels"]["mass"].config(text=round(element_data.mass), font=self.fonts["mass"], fg="white", bg=color)
+
+
+class CanvasTable:
+    """An alternative to Table that draws the whole periodic table on a single canvas.
+    Changes to the cells are collected as dirty cells and only those are redrawn."""
+
+    CELL_SIZE = 60
+    CELL_PAD = 2
+
+    def __init__(self, table_frame: tk.Frame, app: 'App', elements: PeriodicTable, rows=10, cols=18):
+        self.table_frame = table_frame
+        self.app = app
+        self.rows = rows
+        self.cols = cols
+        self.cells = {}
+        self.elements = elements
+        self.fonts = table_fonts()
+
+        self.wanted = {} # Cell -> True if it should be revealed, or its color in the heatmap
+        self.painted = {} # Cell -> True if it is drawn revealed
+        self.dirty = set()
+
+        pitch = self.CELL_SIZE + 2*self.CELL_PAD
+        self.canvas = tk.Canvas(self.table_frame, width=cols*pitch, height=rows*pitch, highlightthickness=0)
+        self.canvas.grid()
+        self.canvas.bind("<Button-1>", self._on_click)
+
+        self._build_grid()
+
+
+    def _build_grid(self):
+        pitch = self.CELL_SIZE + 2*self.CELL_PAD
+        for element_data in self.elements.get_all_elements():
+            r, c = element_data.pos
+            if not (1 <= r <= self.rows and 1 <= c <= self.cols):
+                continue
+
+            x = (c-1)*pitch + self.CELL_PAD
+            y = (r-1)*pitch + self.CELL_PAD
+            self.cells[(r, c)] = {
+                "element_data": element_data,
+                "rect": self.canvas.create_rectangle(x, y, x+self.CELL_SIZE, y+self.CELL_SIZE, width=0),
+                "atnum": self.canvas.create_text(x+3, y+1, anchor="nw", fill="white", font=self.fonts["atnum"]),
+                "symbol": self.canvas.create_text(x+3, y+self.CELL_SIZE-1, anchor="sw", fill="white", font=self.fonts["symbol"]),
+                "mass": self.canvas.create_text(x+self.CELL_SIZE-3, y+4, anchor="ne", fill="white", font=self.fonts["mass"])}
+
+
+    def _on_click(self, event) -> None:
+        # Hit-testing goes through the position index instead of one binding per cell
+        pitch = self.CELL_SIZE + 2*self.CELL_PAD
+        element_data = self.elements.lookup_by_pos((event.y // pitch + 1, event.x // pitch + 1))
+        if element_data:
+            self.app.submit_table_pos(element_data)
+
+
+    def _set(self, cell: tuple, shown: bool | str) -> None:
+        if self.wanted.get(cell) != shown:
+            self.wanted[cell] = shown
+            self.dirty.add(cell)
+
+
+    @instrument.timed("CanvasTable.repaint")
+    def repaint(self) -> None:
+        """Redraws the cells that have changed since the last repaint."""
+
+        for cell in self.dirty:
+            shown = self.wanted[cell]
+            if self.painted.get(cell) == shown: # Changed back before it was drawn
+                continue
+            self.painted[cell] = shown
+
+            cell_data = self.cells[cell]
+            element_data = cell_data["element_data"]
+            fill = shown if isinstance(shown, str) else element_data.color if shown else element_data.bg_color
+            self.canvas.itemconfigure(cell_data["rect"], fill=fill)
+            self.canvas.itemconfigure(cell_data["atnum"], text=element_data.atnum if shown else "")
+            self.canvas.itemconfigure(cell_data["symbol"], text=element_data.symbol if shown else "")
+            self.canvas.itemconfigure(cell_data["mass"], text=round(element_data.mass) if shown else "")
+        self.dirty.clear()
+
+
+    def show_element(self, cell: tuple) -> None:
+        """Reveals an element in the periodic table that corresponds with the specified cell."""
+
+        self._set(cell, True)
+        self.repaint()
+
+
+    def show_periodic_table(self) -> None:
+        """Reveals the whole periodic table"""
+
+        for cell in self.cells:
+            self._set(cell, True)
+        self.repaint()
+
+
+    def hide_element(self, cell: tuple) -> None:
+        """Hides an element in the periodic table that corresponds with the specified cell."""
+
+        self._set(cell, False)
+        self.repaint()
+
+
+    def clear_periodic_table(self) -> None:
+        """Clears the whole periodic table."""
+
+        for cell in self.cells:
+            self._set(cell, False)
+        self.repaint()
+
+
+    def show_heatmap(self, colors: list[str]) -> None:
+        """Reveals every element in its heatmap color. colors is indexed by element index."""
+
+        for cell, cell_data in self.cells.items():
+            self._set(cell, colors[cell_data["element_data"].index])
+        self.repaint()
+
+
 class InputPanel:
     """A GUI component that responsible for user input using buttons and entries.
-    Input panel also displays relevant labels, such as title and question."""
+    Input panel also displays relevant labels, such as title and question.
+    Each layout is only built once, updates just change the text of the existing widgets."""
 
     def __init__(self, panel_frame: tk.Frame, app: 'App'):
 
@@ -207,79 +282,252 @@ class InputPanel:
         self.body = tk.Frame(self.panel_frame)
         self.body.grid(row=1)
 
+        self.title_label = tk.Label(self.header, font=("Segoe UI", 32))
+        self.title_label.grid(column=0, row=0, padx=30)
+        self.header_btn = tk.Button(self.header)
+        self.header_btn.grid(column=0, row=1)
+
+        self.layouts = {} # Layout name -> frame in body, built the first time it is shown
+        self.current_layout = None
+
 
-    def _clear_widgets(self, title): # Has functionality to clear canvas and replace with new title
-        # Clears the canvas to fill with new widgets
-        for widget in self.header.winfo_children():
-            widget.destroy()
-        for widget in self.body.winfo_children():
-            widget.destroy()
+    def _show_layout(self, name: str, title: str) -> dict:
+        # Switches to the named layout and sets the header. Returns the widgets of the layout.
+        if name not in self.layouts:
+            frame = tk.Frame(self.body)
+            self.layouts[name] = {"frame": frame}
+            getattr(self, f"_build_{name}_layout")(self.layouts[name])
+
+        if self.current_layout != name:
+            if self.current_layout:
+                self.layouts[self.current_layout]["frame"].grid_remove()
+            self.layouts[name]["frame"].grid(row=0, column=0)
+            self.current_layout = name
 
         btn_text = "Avsluta" if title == "Välj spel" else "Tillbaka" # Implementation to check page state
         btn_type = self.app.quit if title == "Välj spel" else self.app.back
-        tk.Label(self.header, text=title, font=("Segoe UI", 32)).grid(column=0, row=0, padx=30)
-        tk.Button(self.header, text=btn_text, command= btn_type).grid(column=0, row=1)
+        if self.title_label.cget("text") != title:
+            self.title_label.config(text=title)
+            self.header_btn.config(text=btn_text, command=btn_type)
+        return self.layouts[name]
+
+
+    def _build_start_layout(self, layout: dict) -> None:
+        frame = layout["frame"]
+        tk.Button(frame, text="Öva på atomnummer", command= lambda: self.app.start_game(games.AtnumGame)).grid()
+        tk.Button(frame, text="Öva på atomnamn", command= lambda: self.app.start_game(games.NameGame)).grid()
+        tk.Button(frame, text="Öva på atombeteckningar", command= lambda: self.app.start_game(games.SymbolGame)).grid()
+        tk.Button(frame, text="Öva på atommassa", command= lambda: self.app.start_game(games.MassGame)).grid()
+        tk.Button(frame, text="Öva på periodiska tabellen", command= lambda: self.app.start_game(games.PeriodicGame)).grid()
+        layout["heatmap"] = tk.Button(frame, text="Visa felkarta", command=self.app.toggle_heatmap)
+        layout["heatmap"].grid(pady=(20, 0))
+
+
+    def _build_question_widgets(self, layout: dict) -> None:
+        # Question and feedback labels, shared by all game layouts
+        layout["question"] = tk.Label(layout["frame"])
+        layout["question"].grid(row=0, column=0)
+        layout["feedback"] = tk.Label(layout["frame"])
+        layout["feedback"].grid(row=2, column=0, pady=(30,0))
+
+
+    def _build_basegame_layout(self, layout: dict) -> None:
+        self._build_question_widgets(layout)
+
+        usr_input = tk.Entry(layout["frame"])
+        usr_input.grid(row=1, column=0)
+        usr_input.bind("<KeyRelease>", lambda _: self._update_suggestions())
+        usr_input.bind("<Tab>", lambda _: self._accept_suggestion())
+        layout["entry"] = usr_input
+        tk.Button(layout["frame"],
+                  text="Rätta",
+                  command=lambda: self.app.submit_answer(usr_input.get())).grid(row=1, column=1)
+
+        # Suggestions while typing, placed between the entry and the feedback
+        layout["suggestions"] = tk.Label(layout["frame"], fg="gray")
+        layout["suggestions"].grid(row=2, column=0)
+        layout["feedback"].grid(row=3)
+        layout["matcher"] = None
+
+
+    def _update_suggestions(self) -> None:
+        layout = self.layouts["basegame"]
+        matcher = layout["matcher"]
+        suggestions = matcher.suggest(layout["entry"].get()) if matcher else []
+        self._set_text(layout["suggestions"], ", ".join(suggestions))
+
+
+    def _accept_suggestion(self) -> str:
+        # Tab completes the entry with the first suggestion
+        layout = self.layouts["basegame"]
+        matcher = layout["matcher"]
+        suggestions = matcher.suggest(layout["entry"].get(), 1) if matcher else []
+        if suggestions:
+            layout["entry"].delete(0, tk.END)
+            layout["entry"].insert(0, suggestions[0])
+            self._update_suggestions()
+        return "break" # Keeps the focus in the entry
+
+
+    def _build_periodic_layout(self, layout: dict) -> None:
+        self._build_question_widgets(layout)
+
+        layout["progress"] = tk.Label(layout["frame"], fg="gray")
+        layout["progress"].grid(row=1, column=0)
+        tk.Button(layout["frame"], text="Ledtråd", command=self.app.show_hint).grid(row=0, column=1, padx=(10, 0))
+
+
+    def show_hint(self, hint: str) -> None:
+        """Shows a hint where the feedback is, until the next answer."""
+
+        self._set_text(self.layouts["periodic"]["feedback"], hint)
+
+
+    def _build_mass_layout(self, layout: dict) -> None:
+        self._build_question_widgets(layout)
+
+        layout["btn_frame"] = tk.Frame(layout["frame"])
+        layout["btn_frame"].grid(row=1, column=0)
+        layout["buttons"] = []
+
+
+    def _set_text(self, label: tk.Label, text: str) -> None:
+        # Only touches the widget if the text has changed
+        if label.cget("text") != text:
+            label.config(text=text)
+
+
+    def clear_entry(self) -> None:
+        """Empties the answer entry of the base games."""
+
+        if "basegame" in self.layouts:
+            self.layouts["basegame"]["entry"].delete(0, tk.END)
 
 
     def start_screen(self) -> None:
         """Startscreen interface with game choices."""
 
-        self._clear_widgets("Välj spel")
-        tk.Button(self.body, text="Öva på atomnummer", command= lambda: self.app.start_game(games.AtnumGame)).grid()
-        tk.Button(self.body, text="Öva på atomnamn", command= lambda: self.app.start_game(games.NameGame)).grid()
-        tk.Button(self.body, text="Öva på atombeteckningar", command= lambda: self.app.start_game(games.SymbolGame)).grid()
-        tk.Button(self.body, text="Öva på atommassa", command= lambda: self.app.start_game(games.MassGame)).grid()
-        tk.Button(self.body, text="Öva på periodiska tabellen", command= lambda: self.app.start_game(games.PeriodicGame)).grid()
+        self._show_layout("start", "Välj spel")
 
 
+    @instrument.timed("InputPanel.update_basegame_layout")
     def update_basegame_layout(self, game_instance: games.BaseGames) -> None:
         """Uppdates the question and feedback for the base games.
         This layout consists of a generic header, question, entry box, submit btn and feedback."""
 
-        self._clear_widgets(game_instance.title) # Title depends on the game type
-        tk.Label(self.body, text=game_instance.get_current_question()).grid(row=0, column=0)
-        feedback = tk.Label(self.body, text=game_instance.get_question_status())
-        feedback.grid(row=2, column=0, pady=(30,0))
+        layout = self._show_layout("basegame", game_instance.title) # Title depends on the game type
+        self._set_text(layout["question"], game_instance.get_current_question())
+        self._set_text(layout["feedback"], game_instance.get_question_status())
 
-        usr_input = tk.Entry(self.body)
-        usr_input.grid(row=1, column=0)
-        usr_input.focus_set() # So that you dont need to click the entry box every time
-        tk.Button(self.body,
-                  text="Rätta",
-                  command=lambda: self.app.submit_answer(usr_input.get())).grid(row=1, column=1)
+        # Only names and symbols get suggestions, numbers would give the answer away
+        has_suggestions = game_instance.correct_attr in ("name", "symbol")
+        layout["matcher"] = matching.get_matcher(game_instance.elements, game_instance.correct_attr) if has_suggestions else None
+
+        layout["entry"].focus_set() # So that you dont need to click the entry box every time
+        self._set_text(layout["suggestions"], "")
 
 
+    @instrument.timed("InputPanel.update_periodic_layout")
     def update_periodic_layout(self, game_instance: games.PeriodicGame) -> None:
         """Uppdates the question and feedback for periodic game.
         This layout consists of a generic header, question and feedback"""
 
-        self._clear_widgets("Fyll i det periodiska systemet")
-        tk.Label(self.body, text=game_instance.get_current_question()).grid(row=0, column=0)
-        feedback = tk.Label(self.body, text=game_instance.get_question_status())
-        feedback.grid(row=2, column=0, pady=(30,0))
+        layout = self._show_layout("periodic", "Fyll i det periodiska systemet")
+        self._set_text(layout["question"], game_instance.get_current_question())
+        self._set_text(layout["feedback"], game_instance.get_question_status())
+        placed, total = game_instance.progress()
+        self._set_text(layout["progress"], f"{placed} av {total} placerade")
 
 
+    @instrument.timed("InputPanel.update_mass_layout")
     def update_mass_layout(self, game_instance: games.MassGame) -> None:
         """Uppdates the question and feedback for the base games.
         This layout consists of a generic header, question and 3 answer choices."""
 
-        self._clear_widgets("Träna på atommassa")
-        tk.Label(self.body, text=game_instance.get_current_question()).grid(row=0, column=0)
-        feedback = tk.Label(self.body, text=game_instance.get_question_status())
-        feedback.grid(row=2, column=0, pady=(30,0))
+        layout = self._show_layout("mass", "Träna på atommassa")
+        self._set_text(layout["question"], game_instance.get_current_question())
+        self._set_text(layout["feedback"], game_instance.get_question_status())
 
-        btn_frame = tk.Frame(self.body)
-        btn_frame.grid(row=1, column=0)
-        for i, content in enumerate(game_instance.get_answers()): # The program displays mass as 'int' for ease of use but uses floats internally
-            # Grids the btns horizontally, passes on the mass as answer
-            tk.Button(btn_frame, text=round(content), command=lambda ct=content: self.app.submit_answer(ct)).grid(row=1, column=i)
+        answers = game_instance.get_answers()
+        buttons = layout["buttons"]
+        while len(buttons) < len(answers): # Buttons are only created when more choices are needed
+            buttons.append(tk.Button(layout["btn_frame"]))
+            buttons[-1].grid(row=1, column=len(buttons)-1) # Grids the btns horizontally
+        for i, button in enumerate(buttons):
+            if i < len(answers): # The program displays mass as 'int' for ease of use but uses floats internally
+                button.config(text=round(answers[i]), command=lambda ct=answers[i]: self.app.submit_answer(ct))
+                button.grid()
+            else:
+                button.grid_remove()
 
 
-class App():
-    """Creates all the game class instances and handles the flow."""
+class RenderScheduler:
+    """Collects what needs to be redrawn and redraws it all in one frame when Tk is idle.
+    Marking the same thing again before the frame is drawn only draws it once, so events that
+    arrive faster than the redraws are handled without waiting for them."""
 
     def __init__(self, root: tk.Tk):
         self.root = root
+        self.pending = {} # Key -> function that redraws it, in the order they were marked
+        self.first_marked = 0.0 # When the oldest pending change was marked
+        self.frames = 0
+        self.last_frame_ms = 0.0
+        self.max_depth = 0 # Most changes drawn in one frame
+
+
+    @property
+    def depth(self) -> int:
+        """Number of changes waiting for the next frame."""
+        return len(self.pending)
+
+
+    def mark(self, key, redraw) -> None:
+        """Marks key, e.g. "panel" or a table cell, as dirty. redraw is called in the next frame."""
+
+        if not self.pending:
+            self.first_marked = time.perf_counter()
+            self.root.after_idle(self._frame)
+        self.pending[key] = redraw
+
+
+    def is_pending(self, key) -> bool:
+        """Returns True if key has changed but isnt drawn yet."""
+        return key in self.pending
+
+
+    def clear(self) -> None:
+        """Drops every pending change, e.g. when the screen is replaced anyway."""
+        self.pending.clear()
+
+
+    def _frame(self) -> None:
+        if not self.pending: # Cleared since it was scheduled
+            return
+        start = time.perf_counter()
+        pending, self.pending = self.pending, {}
+        for redraw in pending.values():
+            redraw()
+
+        end = time.perf_counter()
+        self.frames += 1
+        self.last_frame_ms = (end - start) * 1000
+        self.max_depth = max(self.max_depth, len(pending))
+        instrument.observe("App.frame", self.last_frame_ms)
+        instrument.observe("App.frame.latency", (end - self.first_marked) * 1000) # From the first change to drawn
+        instrument.count("App.frame.changes", len(pending))
+
+
+class App():
+    """Creates all the game class instances and handles the flow. The journals, stats and
+    results are kept in journal_dir, results_path and error_stats_path. tolerance is the
+    number of typos that are forgiven in the name and symbol games."""
+
+    def __init__(self, root: tk.Tk, table_class=Table, heatmap_paths=(),
+                 journal_dir=JOURNAL_DIR, results_path=RESULTS_PATH, error_stats_path=ERROR_STATS_PATH, tolerance=0):
+        self.root = root
+        self.tolerance = tolerance
+        self.journal_dir = journal_dir
+        self.error_stats_path = error_stats_path
 
         self.elements = PeriodicTable()
 
@@ -289,19 +537,99 @@ class App():
         self.panel_frame = tk.Frame(self.root)
         self.panel_frame.grid(column=0, row=1, padx=10, pady=10)
 
-        self.table = Table(self.table_frame, self, self.elements)
+        self.table = table_class(self.table_frame, self, self.elements) # Table or CanvasTable
         self.panel = InputPanel(self.panel_frame, self)
+        self.render = RenderScheduler(self.root) # Answers only mark what changed, it is drawn when idle
 
         self.game_instance = None
+        self.journal = None
+        self.recorder = None
+        try:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self.results = results.ResultsStore(results_path)
+        except (OSError, sqlite3.Error): # E.g. read only storage, the game works without saving results
+            self.results = None
+
+        # The heatmap shows the stats in heatmap_paths (e.g. a whole class) or else the own stats
+        self.heatmap_paths = list(heatmap_paths)
+        self.error_stats = None # Own stats, loaded when idle since NumPy is slow to import
+        self._atnum_array = None
+        self.heatmap_shown = False
 
         self.startscreen()
+        self.root.after(JOURNAL_FLUSH_MS, self._flush)
+        self.root.after_idle(self._load_error_stats)
+
+
+    def _load_error_stats(self) -> None:
+        try:
+            import heatmap
+        except ImportError:
+            return # No heatmap without NumPy
+        try:
+            self.error_stats = heatmap.load(self.error_stats_path, self._atnums().max() + 1)
+        except (OSError, ValueError):
+            self.error_stats = heatmap.ErrorStats(self._atnums().max() + 1) # Unreadable, starts over
+
+
+    def _atnums(self):
+        # The atomic number of every element, in element index order
+        if self._atnum_array is None:
+            import numpy as np
+            self._atnum_array = np.fromiter((element.atnum for element in self.elements.get_all_elements()), dtype=np.intp)
+        return self._atnum_array
+
+
+    def save_error_stats(self) -> None:
+        """Saves the own right and wrong answers per element."""
+
+        if self.error_stats:
+            try:
+                os.makedirs(os.path.dirname(self.error_stats_path) or ".", exist_ok=True)
+                self.error_stats.save(self.error_stats_path)
+            except OSError: # E.g. read only storage, the stats are only kept until the game is closed
+                pass
+
+
+    def _count_result(self, element: Element, correct: bool) -> None:
+        if self.results:
+            self.results.record_answer(element.atnum, correct)
+        if self.error_stats:
+            self.error_stats.add(element.atnum, correct)
+
+
+    @instrument.timed("App.toggle_heatmap")
+    def toggle_heatmap(self) -> None:
+        """Colors the table by how often each element is answered wrong, or back to normal."""
+
+        button = self.panel.layouts["start"]["heatmap"]
+        if self.heatmap_shown:
+            self.heatmap_shown = False
+            button.config(text="Visa felkarta")
+            self.table.show_periodic_table()
+            return
+
+        if self.error_stats is None:
+            button.config(text="Felkartan kräver NumPy")
+            return
+        if self.heatmap_paths:
+            import heatmap
+            stats = heatmap.load_all(self.heatmap_paths, self._atnums().max() + 1)
+        else:
+            stats = self.error_stats
+        self.heatmap_shown = True
+        button.config(text="Dölj felkarta")
+        self.table.show_heatmap(stats.colors(self._atnums()))
 
 
     def startscreen(self) -> None:
         """Switches to main menu."""
 
         self.panel.start_screen()
-        self.table.show_periodic_table()
+        if self.heatmap_shown:
+            self.toggle_heatmap() # Also shows the normal table
+        else:
+            self.table.show_periodic_table()
 
 
     def quit(self) -> None:
@@ -313,51 +641,185 @@ class App():
     def back(self) -> None:
         """End the current game and goes back to the main menu."""
 
+        self.render.clear()
         self.startscreen()
+        self.save_recording()
+        self.save_error_stats()
+        if self.results:
+            self.results.end_game()
         self.game_instance = None # Deletes game instance
+        if self.journal:
+            self.journal.discard() # The game was ended on purpose, nothing to resume
+            self.journal = None
+
+
+    def _flush(self) -> None:
+        # Writes buffered answers to disk every JOURNAL_FLUSH_MS, outside of the answer path.
+        # If the disk fails (e.g. it is full) the game goes on without saving
+        self.root.after(JOURNAL_FLUSH_MS, self._flush)
+        if self.journal:
+            try:
+                self.journal.flush()
+            except OSError:
+                self.journal = None
+        if self.results:
+            try:
+                self.results.flush()
+            except sqlite3.Error:
+                self.results = None
+
 
+    def close_journal(self) -> None:
+        """Saves the current game, so that it is resumed when it is started the next time."""
 
+        if self.journal:
+            self.journal.close()
+            if self.results:
+                self.results.suspend() # Ended and ranked when the resumed game ends
+
+
+    def save_recording(self) -> None:
+        """Saves the recording of the current game, if it is recorded."""
+
+        if self.recorder:
+            os.makedirs(RECORD_DIR, exist_ok=True)
+            name = f"{type(self.game_instance).__name__}-{time.strftime('%Y%m%d-%H%M%S')}-{self.recorder.seed}.rec"
+            self.recorder.save(os.path.join(RECORD_DIR, name))
+            self.recorder = None
+
+
+    def _open_journal(self, game, options: dict):
+        # Returns the game resumed from the journal, or None. The game is played without a
+        # journal if it cant be written, e.g. on read only storage
+        try:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            self.journal = journal.SessionJournal(os.path.join(self.journal_dir, game.__name__), self.elements)
+            return self.journal.resume(game, **options)
+        except OSError:
+            self.journal = None
+            return None
+
+
+    @instrument.timed("App.start_game")
     def start_game(self, game) -> None:
-        """Starts a new game. Expects an instance of the game."""
+        """Starts a new game, or resumes it if it was interrupted. Expects the game class."""
 
+        self.save_recording()
+        self.render.clear()
         self.table.clear_periodic_table()
-        self.game_instance = game(self.elements)
+        options = {}
+        if self.tolerance and issubclass(game, (games.NameGame, games.SymbolGame)):
+            options["tolerance"] = self.tolerance
+        self.game_instance = self._open_journal(game, options)
+        resume_id = self.journal.info.get("results_game") if self.game_instance else None
+        if self.game_instance is None:
+            seed = replay.new_seed()
+            self.game_instance = game(self.elements, rng=seed, **options)
+            if RECORD_DIR: # A resumed game is not recorded, its seed is not known
+                self.recorder = replay.SessionRecorder(self.game_instance, seed, **options)
+        self.game_instance.on_result = self._count_result
+
+        # A resumed game continues the same game in the results, the id is kept in the journal
+        goal = len(self.elements) if game is games.PeriodicGame else None # Ranked when the table is full
+        if self.results:
+            self.results.start_game(game.__name__, USER, goal, resume_id)
+        try:
+            if self.journal:
+                self.journal.start(self.game_instance, {"results_game": self.results.game_id if self.results else None})
+        except OSError:
+            self.journal = None
+
+        if isinstance(self.game_instance, games.PeriodicGame):
+            for element in self.game_instance.get_placed():
+                self.table.show_element(element.pos)
+
+        self.panel.clear_entry()
+        self._render_panel()
+
+
+    def _render_panel(self) -> None:
+        # Shows the current state of the game in the panel
         if isinstance(self.game_instance, games.MassGame):
             self.panel.update_mass_layout(self.game_instance)
         elif isinstance(self.game_instance, games.PeriodicGame):
             self.panel.update_periodic_layout(self.game_instance)
-        else:
+        elif self.game_instance:
             self.panel.update_basegame_layout(self.game_instance)
 
 
+    def _is_stale(self) -> bool:
+        # Input that arrives before the panel shows the last answer was meant for the
+        # question before, it is dropped instead of answering a question that isnt shown yet
+        if self.render.is_pending("panel"):
+            instrument.count("App.stale_input")
+            return True
+        return False
+
+
+    def _record(self, answer) -> None:
+        if self.journal:
+            self.journal.record(answer)
+        if self.recorder:
+            self.recorder.record(answer)
+
+
+    @instrument.timed("App.submit_answer")
     def submit_answer(self, answer) -> None:
         """Forwards the answer to the game instance."""
 
+        if self._is_stale():
+            return
+
         if isinstance(self.game_instance, games.MassGame):
             self.game_instance.update(answer)
-            self.panel.update_mass_layout(self.game_instance)
+            self._record(answer)
+            self.render.mark("panel", self._render_panel)
+            self.root.after_idle(self.game_instance.prefetch) # Refills the upcoming questions after the repaint
         elif self.game_instance:
             self.game_instance.update(answer)
-            self.panel.update_basegame_layout(self.game_instance)
+            self._record(answer)
+            self.panel.clear_entry() # At once, so that what is typed next is kept
+            self.render.mark("panel", self._render_panel)
+
 
+    def show_hint(self) -> None:
+        """Shows where the element of the periodic game is. Doesnt change the game."""
 
+        if isinstance(self.game_instance, games.PeriodicGame) and not self._is_stale():
+            self.panel.show_hint(self.game_instance.hint())
+
+
+    @instrument.timed("App.submit_table_pos")
     def submit_table_pos(self, answer: Element) -> None:
         """Forwards a table click to the game instance"""
 
+        if self._is_stale():
+            return
+
         if isinstance(self.game_instance, games.PeriodicGame):
             is_correct = self.game_instance.update(answer)
+            self._record(answer)
             if is_correct:
-                self.table.show_element(answer.pos)
+                self.render.mark(answer.pos, lambda: self.table.show_element(answer.pos))
 
-            self.panel.update_periodic_layout(self.game_instance)
+            self.render.mark("panel", self._render_panel)
 
 
 def main():
     """Main"""
     root = tk.Tk()
     root.title("Periodiska spelet")
-    App(root)
+    # --heatmap FILE... shows the stats of other learners, e.g. a class, in the heatmap
+    heatmap_paths = sys.argv[sys.argv.index("--heatmap")+1:] if "--heatmap" in sys.argv else []
+    # --tolerance N forgives N typos in the name and symbol games, e.g. Aluminum for Aluminium
+    tolerance = int(sys.argv[sys.argv.index("--tolerance")+1]) if "--tolerance" in sys.argv else 0
+    app = App(root, CanvasTable if "--canvas" in sys.argv else Table, heatmap_paths, tolerance=tolerance)
     root.mainloop()
+    app.close_journal()
+    app.save_recording()
+    app.save_error_stats()
+    if app.results:
+        app.results.close()
 
 
 if __name__ == "__main__":
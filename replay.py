@@ -0,0 +1,127 @@
+"""
+P-uppgift - periodiska systemet
+replay-file, records game sessions so that they can be replayed exactly
+
+Every game draws its questions from its own random generator. A recording only has to hold
+the name of the game, the seed of the generator and the answers that were given, replaying
+them against a game seeded the same way gives back the same questions. The state of the game
+at the end is stored as well, and a replay that doesnt end in that state is an error.
+
+Replays run headless at full speed, which makes them useful for reproducing bugs and as
+benchmark workloads.
+
+Run from the repository root: python replay.py RECORDING [--repeat N]
+"""
+
+import argparse
+import marshal
+import os
+import random
+import time
+import games
+import journal
+from model import PeriodicTable
+
+RECORDING_VERSION = 3
+
+GAMES = {game.__name__: game for game in
+         (games.AtnumGame, games.NameGame, games.SymbolGame, games.MassGame, games.PeriodicGame)}
+
+
+class ReplayError(ValueError):
+    """Raised when a recording can't be read, or doesnt replay to the recorded state."""
+
+
+def new_seed() -> int:
+    """Returns a seed for a game that is going to be recorded."""
+
+    return random.randrange(2**32)
+
+
+class SessionRecorder:
+    """Records the answers given to a game. The game must have been created with
+    rng=seed and the given options, e.g. SessionRecorder(game, seed) for game = NameGame(elements, rng=seed)."""
+
+    def __init__(self, game, seed: int, **options):
+        self.game = game
+        self.seed = seed
+        self.options = options
+        self.answers = []
+
+
+    def record(self, answer) -> None:
+        """Records an answer that has just been given to the game with update."""
+
+        self.answers.append(journal.encode_answer(self.game, answer))
+
+
+    def save(self, path: str) -> None:
+        """Writes the recording together with the current state of the game."""
+
+        recording = {
+            "version": RECORDING_VERSION,
+            "game": type(self.game).__name__,
+            "seed": self.seed,
+            "options": self.options,
+            "answers": self.answers,
+            "state": self.game.get_state()}
+        with open(path + ".tmp", "wb") as file:
+            marshal.dump(recording, file)
+        os.replace(path + ".tmp", path)
+
+
+def load(path: str) -> dict:
+    """Reads a recording written by SessionRecorder.save."""
+
+    try:
+        with open(path, "rb") as file:
+            recording = marshal.loads(file.read())
+    except (OSError, EOFError, ValueError, TypeError) as error:
+        raise ReplayError(f"{path} can't be read: {error}") from error
+    if not isinstance(recording, dict) or recording.get("version") != RECORDING_VERSION \
+            or recording.get("game") not in GAMES:
+        raise ReplayError(f"{path} is not a recording")
+    return recording
+
+
+def replay(elements, recording: dict):
+    """Plays the recording again and returns the game. Raises ReplayError if the game
+    doesnt end in the recorded state."""
+
+    game = GAMES[recording["game"]](elements, rng=recording["seed"], **recording["options"])
+    for encoded in recording["answers"]:
+        game.update(journal.decode_answer(game, encoded))
+        if isinstance(game, games.MassGame):
+            game.prefetch() # Like the App does after every answer, the scheduler depends on when
+
+    # Compared after a round trip through marshal, so that e.g. lists and tuples compare the same
+    state = marshal.loads(marshal.dumps(game.get_state()))
+    if state != recording["state"]:
+        raise ReplayError(f"{recording['game']} ended in {state}, the recording in {recording['state']}")
+    return game
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description="Replays a recorded game session")
+    parser.add_argument("recording")
+    parser.add_argument("--repeat", type=int, default=1, help="times to replay, for timing")
+    args = parser.parse_args()
+
+    elements = PeriodicTable()
+    try:
+        recording = load(args.recording)
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            replay(elements, recording)
+        elapsed = time.perf_counter() - start
+    except ReplayError as error:
+        raise SystemExit(f"Uppspelningen misslyckades: {error}")
+
+    answers = len(recording["answers"]) * args.repeat
+    print(f"{recording['game']}: {answers} svar på {elapsed * 1000:.1f} ms"
+          f" ({elapsed / max(answers, 1) * 1e6:.1f} us/svar), samma slutläge som inspelningen")
+
+
+if __name__ == "__main__":
+    main()
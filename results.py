@@ -0,0 +1,246 @@
+"""
+P-uppgift - periodiska systemet
+results-file, keeps every answer and every played game in a local SQLite database
+
+Answers are buffered and inserted in batches, the database runs in WAL mode so that reading
+the leaderboard doesnt block the writing. The best game of every user and game type is kept
+in its own table, updated when a game ends, so that the leaderboard only has to read the top
+rows of an index however many games have been played.
+
+Games are ranked by the share of right answers, see score. A game that is interrupted and
+resumed from its journal keeps its id, so that its answers are added together.
+
+Run from the repository root: python results.py [--db PATH] [--game GAME] [--top N]
+"""
+
+import argparse
+import sqlite3
+import time
+
+DB_PATH = "sessions/results.sqlite3"
+SCHEMA_VERSION = 1 # In PRAGMA user_version, 0 is the first version that ranked by the right answers
+MIN_ANSWERS = 20 # Answers an endless game needs to be on the leaderboard
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    game TEXT NOT NULL,
+    user TEXT NOT NULL,
+    started REAL NOT NULL,
+    ended REAL,
+    answers INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0,
+    goal INTEGER);
+CREATE INDEX IF NOT EXISTS games_by_user ON games (game, user, started);
+
+CREATE TABLE IF NOT EXISTS answers (
+    game_id INTEGER NOT NULL REFERENCES games (id),
+    atnum INTEGER NOT NULL,
+    correct INTEGER NOT NULL,
+    time REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS answers_by_game ON answers (game_id);
+
+CREATE TABLE IF NOT EXISTS bests (
+    game TEXT NOT NULL,
+    user TEXT NOT NULL,
+    score REAL NOT NULL,
+    correct INTEGER NOT NULL,
+    answers INTEGER NOT NULL,
+    ended REAL NOT NULL,
+    PRIMARY KEY (game, user));
+CREATE INDEX IF NOT EXISTS bests_by_score ON bests (game, score DESC, answers DESC);
+"""
+
+# Replaces the best game of the user if the new one has a higher score, or the same over more answers
+_UPDATE_BEST = """
+INSERT INTO bests (game, user, score, correct, answers, ended) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (game, user) DO UPDATE SET
+    score = excluded.score, correct = excluded.correct, answers = excluded.answers, ended = excluded.ended
+WHERE excluded.score > bests.score OR (excluded.score = bests.score AND excluded.answers > bests.answers)
+"""
+
+
+def score(correct: int, answers: int, goal: int | None = None) -> float | None:
+    """Returns the score of a game, the share of right answers, or None if the game isnt
+    ranked. A game with a goal, the right answers that finish it (all elements placed in the
+    periodic game), is only ranked when finished, so it is ranked by the fewest tries. An
+    endless game is only ranked after MIN_ANSWERS answers, so a few lucky answers dont win."""
+
+    if answers == 0 or (correct < goal if goal is not None else answers < MIN_ANSWERS):
+        return None
+    return correct / answers
+
+
+class ResultsStore:
+    """The results of one or many users. Answers are written batch_size at a time, or
+    when a game ends or flush is called."""
+
+    def __init__(self, path: str = DB_PATH, batch_size: int = 256):
+        self.db = sqlite3.connect(path)
+        self.db.execute("PRAGMA journal_mode = WAL")
+        self.db.execute("PRAGMA synchronous = NORMAL") # WAL is still crash safe, only the last commits can be lost
+        version = self.db.execute("PRAGMA user_version").fetchone()[0]
+        if version < SCHEMA_VERSION:
+            self._drop_old_schema()
+        self.db.executescript(SCHEMA)
+        if version < SCHEMA_VERSION:
+            self._rebuild_bests()
+        self.batch_size = batch_size
+
+        self.game_id = None # The game being played
+        self.game = None
+        self.user = None
+        self.goal = None
+        self.answers = 0
+        self.correct = 0
+        self._buffer = []
+
+
+    def _drop_old_schema(self) -> None:
+        # The bests were ranked by another score, they are rebuilt from the games
+        with self.db:
+            self.db.execute("DROP TABLE IF EXISTS bests")
+            columns = [row[1] for row in self.db.execute("PRAGMA table_info(games)")]
+            if columns and "goal" not in columns:
+                self.db.execute("ALTER TABLE games ADD COLUMN goal INTEGER")
+
+
+    def _rebuild_bests(self) -> None:
+        with self.db:
+            for game, user, correct, answers, goal, ended in self.db.execute(
+                    "SELECT game, user, correct, answers, goal, ended FROM games WHERE ended IS NOT NULL").fetchall():
+                self._update_best(game, user, correct, answers, goal, ended)
+            self.db.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+
+
+    def _update_best(self, game: str, user: str, correct: int, answers: int, goal: int | None, ended: float) -> None:
+        game_score = score(correct, answers, goal)
+        if game_score is not None:
+            self.db.execute(_UPDATE_BEST, (game, user, game_score, correct, answers, ended))
+
+
+    def start_game(self, game: str, user: str, goal: int | None = None, resume_id: int | None = None) -> None:
+        """Starts recording a game, ends the one before it if there is one. goal is the number
+        of right answers that finishes the game, None for endless games, see score. With the
+        resume_id of an earlier game of the same user and type, that game is continued."""
+
+        self.end_game()
+        row = None
+        if resume_id is not None:
+            row = self.db.execute("SELECT count(*), coalesce(sum(answers.correct), 0) FROM games JOIN answers"
+                                  " ON answers.game_id = games.id WHERE games.id = ? AND game = ? AND user = ?",
+                                  (resume_id, game, user)).fetchone()
+        with self.db:
+            if row and row[0]: # A game without answers was removed when it ended
+                self.game_id = resume_id
+                self.answers, self.correct = row
+                self.db.execute("UPDATE games SET ended = NULL WHERE id = ?", (resume_id,))
+            else:
+                self.game_id = self.db.execute("INSERT INTO games (game, user, started, goal) VALUES (?, ?, ?, ?)",
+                                               (game, user, time.time(), goal)).lastrowid
+                self.answers = 0
+                self.correct = 0
+        self.game = game
+        self.user = user
+        self.goal = goal
+
+
+    def record_answer(self, atnum: int, correct: bool) -> None:
+        """Records an answer to the current game."""
+
+        self.answers += 1
+        self.correct += correct
+        self._buffer.append((self.game_id, atnum, int(correct), time.time()))
+        if len(self._buffer) >= self.batch_size:
+            self.flush()
+
+
+    def flush(self) -> None:
+        """Writes the buffered answers."""
+
+        if self._buffer:
+            with self.db:
+                self.db.executemany("INSERT INTO answers VALUES (?, ?, ?, ?)", self._buffer)
+            self._buffer.clear()
+
+
+    def end_game(self) -> None:
+        """Writes the outcome of the current game. A game without answers is removed."""
+
+        if self.game_id is None:
+            return
+        self.flush()
+        with self.db:
+            if self.answers:
+                ended = time.time()
+                self.db.execute("UPDATE games SET ended = ?, answers = ?, correct = ? WHERE id = ?",
+                                (ended, self.answers, self.correct, self.game_id))
+                self._update_best(self.game, self.user, self.correct, self.answers, self.goal, ended)
+            else:
+                self.db.execute("DELETE FROM games WHERE id = ?", (self.game_id,))
+        self.game_id = None
+
+
+    def suspend(self) -> None:
+        """Writes the answers of the current game without ending it, for a game that is
+        resumed later with start_game(resume_id=...). It isnt ranked until it ends."""
+
+        if self.game_id is None:
+            return
+        self.flush()
+        with self.db:
+            if self.answers:
+                self.db.execute("UPDATE games SET answers = ?, correct = ? WHERE id = ?",
+                                (self.answers, self.correct, self.game_id))
+            else:
+                self.db.execute("DELETE FROM games WHERE id = ?", (self.game_id,))
+        self.game_id = None
+
+
+    def close(self) -> None:
+        """Ends the current game and closes the database."""
+
+        self.end_game()
+        self.db.close()
+
+
+    def leaderboard(self, game: str, limit: int = 10) -> list[tuple]:
+        """Returns (user, correct, answers, ended) of the best game of the top users, by score."""
+
+        return self.db.execute(
+            "SELECT user, correct, answers, ended FROM bests WHERE game = ? ORDER BY score DESC, answers DESC LIMIT ?",
+            (game, limit)).fetchall()
+
+
+    def personal_best(self, game: str, user: str) -> tuple | None:
+        """Returns (correct, answers, ended) of the best ranked game of the user, or None."""
+
+        return self.db.execute(
+            "SELECT correct, answers, ended FROM bests WHERE game = ? AND user = ?", (game, user)).fetchone()
+
+
+    def history(self, game: str, user: str, limit: int = 10) -> list[tuple]:
+        """Returns (started, ended, answers, correct) of the latest games of the user."""
+
+        return self.db.execute(
+            "SELECT started, ended, answers, correct FROM games WHERE game = ? AND user = ? AND ended IS NOT NULL"
+            " ORDER BY started DESC LIMIT ?", (game, user, limit)).fetchall()
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description="Shows the leaderboard")
+    parser.add_argument("--db", default=DB_PATH)
+    parser.add_argument("--game", default="AtnumGame")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args()
+
+    store = ResultsStore(args.db)
+    print(f"Topplista för {args.game}")
+    for place, (user, correct, answers, ended) in enumerate(store.leaderboard(args.game, args.top), 1):
+        print(f"{place:>3}. {user:<20}{correct / answers:>7.1%}, {correct:>5} rätt av {answers:<5} {time.strftime('%Y-%m-%d', time.localtime(ended))}")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
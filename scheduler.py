@@ -0,0 +1,124 @@
+"""
+P-uppgift - periodiska systemet
+scheduler-file, picks the next question so that the elements the learner doesnt know come up more often
+
+Every element is in a Leitner box. A right answer moves it up one box, a wrong answer moves
+it back to the first box, and every box up halves the chance of the element being asked.
+The weights are kept in a Fenwick tree, so that both drawing an element and moving it to
+another box are O(log n) and nothing is rebuilt after an answer.
+"""
+
+from array import array
+
+BOXES = 5 # Weight of an element in box b is 2**(BOXES-1-b), from 16 down to 1
+
+_INITIAL_TREES = {} # Number of elements -> tree with every element in the first box
+
+
+class FenwickTree:
+    """Prefix sums over non-negative integer weights, indexed from 0."""
+
+    __slots__ = ("tree", "mask")
+
+    def __init__(self, weights=(), tree: array | None = None):
+        if tree is None:
+            # Built in O(n) by adding every node to its parent once
+            tree = array("I", [0])
+            tree.extend(weights)
+            for i in range(1, len(tree)):
+                parent = i + (i & -i)
+                if parent < len(tree):
+                    tree[parent] += tree[i]
+        self.tree = tree
+        self.mask = 1 << ((len(tree) - 1).bit_length() - 1) if len(tree) > 1 else 0 # Largest power of two <= n
+
+
+    def add(self, index: int, delta: int) -> None:
+        """Adds delta to the weight at index."""
+
+        tree = self.tree
+        i = index + 1
+        while i < len(tree):
+            tree[i] += delta
+            i += i & -i
+
+
+    def total(self) -> int:
+        """Returns the sum of all weights."""
+
+        tree = self.tree
+        total = 0
+        i = len(tree) - 1
+        while i > 0:
+            total += tree[i]
+            i -= i & -i
+        return total
+
+
+    def find(self, value: int) -> int:
+        """Returns the index whose weight covers value, i.e. the first index where the
+        prefix sum is larger than value. value must be in range(total())."""
+
+        tree = self.tree
+        position = 0
+        step = self.mask
+        while step:
+            if position + step < len(tree) and tree[position + step] <= value:
+                position += step
+                value -= tree[position]
+            step >>= 1
+        return position
+
+
+class LeitnerScheduler:
+    """Chooses element indexes weighted by how well they are known. One per game."""
+
+    __slots__ = ("boxes", "weights", "total")
+
+    def __init__(self, count: int):
+        if count not in _INITIAL_TREES:
+            _INITIAL_TREES[count] = FenwickTree([1 << (BOXES - 1)] * count).tree
+        self.boxes = bytearray(count)
+        self.weights = FenwickTree(tree=array("I", _INITIAL_TREES[count])) # A copy, cheaper than building
+        self.total = count << (BOXES - 1)
+
+
+    def next(self, rng) -> int:
+        """Returns the index of the element to ask about next."""
+
+        return self.weights.find(rng.randrange(self.total))
+
+
+    def _move(self, index: int, box: int) -> None:
+        old = self.boxes[index]
+        if box != old:
+            delta = (1 << (BOXES - 1 - box)) - (1 << (BOXES - 1 - old))
+            self.boxes[index] = box
+            self.weights.add(index, delta)
+            self.total += delta
+
+
+    def correct(self, index: int) -> None:
+        """The element was answered right, it is asked about half as often."""
+
+        self._move(index, min(self.boxes[index] + 1, BOXES - 1))
+
+
+    def wrong(self, index: int) -> None:
+        """The element was answered wrong, it goes back to the first box."""
+
+        self._move(index, 0)
+
+
+    def get_state(self) -> bytes:
+        """Returns the boxes of all elements, see set_state."""
+
+        return bytes(self.boxes)
+
+
+    def set_state(self, boxes: bytes) -> None:
+        """Restores the boxes returned by get_state."""
+
+        self.boxes = bytearray(boxes)
+        self.weights = FenwickTree([1 << (BOXES - 1 - box) for box in self.boxes])
+        self.total = self.weights.total()
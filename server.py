@@ -0,0 +1,326 @@
+"""
+P-uppgift - periodiska systemet
+server-file, serves the games to many learners at once over HTTP
+
+Every learner gets a session with its own game instance, all sessions share one PeriodicTable.
+
+    POST   /sessions              {"game": "atnum"}  -> starts a session, "tolerance": N forgives
+                                                        N typos in the name and symbol games
+    GET    /sessions/<id>                            -> the current question
+    POST   /sessions/<id>/answer  {"answer": ...}    -> answers and returns the next question
+    DELETE /sessions/<id>                            -> ends the session
+
+Answers to the periodic game are given as a position, [row, column]. The mass game shows its
+choices as rounded masses and is answered with the index of the choice, so that the exact
+mass of the right choice is never sent. A request body larger than MAX_BODY gets 413.
+
+Run from the repository root: python server.py [--host HOST] [--port PORT]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import secrets
+import time
+import games
+from model import PeriodicTable
+
+GAMES = {
+    "atnum": games.AtnumGame,
+    "name": games.NameGame,
+    "symbol": games.SymbolGame,
+    "mass": games.MassGame,
+    "periodic": games.PeriodicGame,
+}
+
+MAX_BODY = 4096 # Bytes, every request body is a small JSON object
+MAX_TOLERANCE = 3 # More forgiven typos would accept the names of other elements
+
+STATUS_TEXT = {200: "OK", 201: "Created", 400: "Bad Request", 404: "Not Found", 413: "Content Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    """Raised by the request handlers, turned into an error response."""
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Session:
+    """One learner playing one game."""
+
+    __slots__ = ("game", "last_seen")
+
+    def __init__(self, game):
+        self.game = game
+        self.last_seen = time.monotonic()
+
+
+class QuizServer:
+    """Hosts the game sessions. The routing is done by handle_request, so it can be used
+    without any network as well."""
+
+    def __init__(self, elements: PeriodicTable, idle_timeout: float = 15*60):
+        self.elements = elements
+        self.idle_timeout = idle_timeout
+        self.sessions = {}
+        self._server = None
+        self._evictor = None
+
+
+    async def start(self, host="127.0.0.1", port=8000) -> int:
+        """Starts listening and returns the port, useful when port=0."""
+
+        self._server = await asyncio.start_server(self._handle_connection, host, port)
+        self._evictor = asyncio.create_task(self._evict_idle())
+        return self._server.sockets[0].getsockname()[1]
+
+
+    async def stop(self) -> None:
+        """Stops listening and drops all sessions."""
+
+        self._evictor.cancel()
+        self._server.close()
+        await self._server.wait_closed()
+        self.sessions.clear()
+
+
+    async def _evict_idle(self) -> None:
+        while True:
+            await asyncio.sleep(min(self.idle_timeout, 60))
+            self.evict_idle()
+
+
+    def evict_idle(self) -> int:
+        """Removes sessions that have not been used within idle_timeout. Returns how many."""
+
+        limit = time.monotonic() - self.idle_timeout
+        idle = [session_id for session_id, session in self.sessions.items() if session.last_seen < limit]
+        for session_id in idle:
+            del self.sessions[session_id]
+        return len(idle)
+
+
+    def _state(self, session_id: str, game) -> dict:
+        state = {
+            "session": session_id,
+            "question": game.get_current_question(),
+            "feedback": game.get_question_status(),
+            "attempts": game.attempts,
+        }
+        if isinstance(game, games.MassGame):
+            state["answers"] = [round(mass) for mass in game.get_answers()]
+        return state
+
+
+    def _session(self, session_id: str) -> Session:
+        session = self.sessions.get(session_id)
+        if session is None:
+            raise HTTPError(404, "Okänd session")
+        session.last_seen = time.monotonic()
+        return session
+
+
+    def _answer(self, game, body: dict):
+        # Converts the JSON answer to what the game expects
+        if "answer" not in body:
+            raise HTTPError(400, "Svar saknas")
+        answer = body["answer"]
+
+        if isinstance(game, games.PeriodicGame):
+            element = None
+            if isinstance(answer, list) and len(answer) == 2 and all(isinstance(x, int) for x in answer):
+                element = self.elements.lookup_by_pos(tuple(answer))
+            if element is None:
+                raise HTTPError(400, "Svaret måste vara en position i tabellen")
+            return element
+
+        if isinstance(game, games.MassGame):
+            choices = game.get_answers()
+            if not isinstance(answer, int) or isinstance(answer, bool) or not 0 <= answer < len(choices):
+                raise HTTPError(400, f"Svaret måste vara numret på ett alternativ, 0-{len(choices) - 1}")
+            return choices[answer]
+
+        return str(answer)
+
+
+    def _tolerance(self, game_class, tolerance) -> int:
+        # Checks the tolerance option of a new session
+        if not issubclass(game_class, (games.NameGame, games.SymbolGame)):
+            raise HTTPError(400, "Stavfel kan bara godkännas i namn- och symbolspelen")
+        if not isinstance(tolerance, int) or isinstance(tolerance, bool) or not 0 <= tolerance <= MAX_TOLERANCE:
+            raise HTTPError(400, f"tolerance måste vara ett heltal 0-{MAX_TOLERANCE}")
+        return tolerance
+
+
+    def handle_request(self, method: str, path: str, body: dict) -> tuple[int, dict]:
+        """Handles one request. Returns the status code and the response."""
+
+        parts = path.strip("/").split("/")
+
+        if parts == ["sessions"] and method == "POST":
+            name = body.get("game")
+            game_class = GAMES.get(name) if isinstance(name, str) else None
+            if game_class is None:
+                raise HTTPError(400, f"Okänt spel, välj bland: {', '.join(GAMES)}")
+            # All sessions share the tables random generator, a generator per session would be
+            # several times larger than the rest of the session
+            options = {"rng": self.elements.rng}
+            if game_class is games.MassGame:
+                options["prefetch"] = 0
+            if "tolerance" in body:
+                options["tolerance"] = self._tolerance(game_class, body["tolerance"])
+            game = game_class(self.elements, **options)
+            session_id = secrets.token_hex(8)
+            self.sessions[session_id] = Session(game)
+            return 201, self._state(session_id, game)
+
+        if len(parts) == 2 and parts[0] == "sessions":
+            if method == "GET":
+                return 200, self._state(parts[1], self._session(parts[1]).game)
+            if method == "DELETE":
+                self._session(parts[1])
+                del self.sessions[parts[1]]
+                return 200, {"session": parts[1]}
+
+        if len(parts) == 3 and parts[0] == "sessions" and parts[2] == "answer" and method == "POST":
+            game = self._session(parts[1]).game
+            game.update(self._answer(game, body))
+            return 200, self._state(parts[1], game)
+
+        raise HTTPError(404, "Okänd adress")
+
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, response: dict) -> None:
+        payload = json.dumps(response, ensure_ascii=False).encode("utf-8")
+        writer.write(
+            f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload)
+        await writer.drain()
+
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        # Minimal HTTP/1.1 with keep-alive, enough for the loopback client and a browser
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if not 0 <= length <= MAX_BODY:
+                    # The body is never read, so the rest of the connection cant be understood
+                    await self._respond(writer, 413, {"error": f"Högst {MAX_BODY} byte per förfrågan"})
+                    break
+                raw_body = await reader.readexactly(length)
+
+                try:
+                    body = json.loads(raw_body) if raw_body else {}
+                    if not isinstance(body, dict):
+                        raise HTTPError(400, "Felaktig JSON")
+                    status, response = self.handle_request(method, path, body)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    status, response = 400, {"error": "Felaktig JSON"}
+                except HTTPError as error:
+                    status, response = error.status, {"error": str(error)}
+                except Exception: # A bug in a handler, the client still gets an answer
+                    logging.exception("Fel vid %s %s", method, path)
+                    status, response = 500, {"error": "Internt fel"}
+                await self._respond(writer, status, response)
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass # Broken or malformed connection, just drop it
+        finally:
+            writer.close()
+
+
+class QuizClient:
+    """A small client for the QuizServer, used for testing and load tests."""
+
+    def __init__(self, host="127.0.0.1", port=8000):
+        self.host = host
+        self.port = port
+        self._reader = None
+        self._writer = None
+
+
+    async def connect(self) -> None:
+        """Opens the connection, it is kept open for all requests."""
+
+        self._reader, self._writer = await asyncio.open_connection(self.host, self.port)
+
+
+    async def close(self) -> None:
+        """Closes the connection."""
+
+        self._writer.close()
+        await self._writer.wait_closed()
+
+
+    async def request(self, method: str, path: str, body: dict | None = None) -> tuple[int, dict]:
+        """Sends a request and returns the status code and the JSON response."""
+
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        self._writer.write(
+            f"{method} {path} HTTP/1.1\r\nHost: {self.host}\r\n"
+            f"Content-Type: application/json\r\nContent-Length: {len(payload)}\r\n\r\n".encode("latin-1") + payload)
+        await self._writer.drain()
+
+        status = int((await self._reader.readline()).split()[1])
+        length = 0
+        while (line := await self._reader.readline()) not in (b"\r\n", b""):
+            name, _, value = line.decode("latin-1").partition(":")
+            if name.lower() == "content-length":
+                length = int(value)
+        return status, json.loads(await self._reader.readexactly(length))
+
+
+    async def start_game(self, game: str, **options) -> dict:
+        """Starts a session of the game and returns its first question. options are sent
+        with it, e.g. tolerance=1."""
+        return (await self.request("POST", "/sessions", {"game": game, **options}))[1]
+
+
+    async def answer(self, session_id: str, answer) -> dict:
+        """Answers the current question of a session. The mass game is answered with the
+        index of the choice."""
+        return (await self.request("POST", f"/sessions/{session_id}/answer", {"answer": answer}))[1]
+
+
+async def serve(host: str, port: int, idle_timeout: float) -> None:
+    """Runs the server until it is interrupted."""
+
+    server = QuizServer(PeriodicTable(), idle_timeout)
+    port = await server.start(host, port)
+    print(f"Servern körs på http://{host}:{port}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await server.stop()
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description="Serves the games over HTTP")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--idle-timeout", type=float, default=15*60, help="seconds before an unused session is removed")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.idle_timeout))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
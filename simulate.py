@@ -0,0 +1,200 @@
+"""
+P-uppgift - periodiska systemet
+simulate-file, estimates how hard the game modes are by letting simulated learners play them
+
+Every simulated learner plays the real game classes from games.py. How often a learner knows
+an answer is decided by an error model. The learners are split into chunks that run in a
+process pool, each chunk with its own seed, and the results of the chunks are merged.
+
+Run from the repository root: python simulate.py [--learners N] [--workers N] [--seed N]
+"""
+
+import argparse
+import os
+import random
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+import games
+from model import PeriodicTable
+
+CHUNK_SIZE = 2000 # Learners per task sent to a worker
+
+BASE_GAMES = {"atnum": games.AtnumGame, "name": games.NameGame, "symbol": games.SymbolGame}
+
+
+def _uniform_model(skill: float, index: int, count: int) -> float:
+    # Every element is as hard as the others
+    return skill
+
+
+def _heavy_model(skill: float, index: int, count: int) -> float:
+    # Heavier elements are less known, the heaviest half as well as the lightest
+    return skill * (1 - 0.5 * index / count)
+
+
+# Error models: probability that the learner knows the answer to an element
+ERROR_MODELS = {"uniform": _uniform_model, "heavy": _heavy_model}
+
+_table = None # The PeriodicTable of the worker process
+
+
+def _init_worker() -> None:
+    global _table
+    _table = PeriodicTable()
+
+
+def _know_chances(model: str, skill: float) -> list[float]:
+    count = len(_table)
+    return [ERROR_MODELS[model](skill, index, count) for index in range(count)]
+
+
+def _play_base(task: dict, rng: random.Random) -> dict:
+    # Counts the attempts used per question, with attempts=3
+    know = _know_chances(task["model"], task["skill"])
+    attempts = Counter()
+    solved = 0
+
+    for _ in range(task["learners"]):
+        game = BASE_GAMES[task["game"]](_table, rng=rng) # Every learner starts with an empty scheduler
+        for _ in range(task["questions"]):
+            index = game.current_question.index
+            used = 0
+            while True:
+                used += 1
+                correct = rng.random() < know[index]
+                value = game.bank.correct[index]
+                # A wrong answer has to look like an answer, otherwise it doesnt cost an attempt
+                game.update(str(value) if correct else str(value + 1) if isinstance(value, int) else "fel")
+                if correct or game.attempts == game.max_attempts: # Moved on to the next question
+                    break
+            attempts[used] += 1
+            solved += correct
+    return {"attempts": attempts, "solved": solved}
+
+
+def _play_mass(task: dict, rng: random.Random) -> dict:
+    # The learner remembers the mass with a relative error and picks the closest choice
+    know = _know_chances(task["model"], task["skill"])
+    solved = 0
+
+    for _ in range(task["learners"]):
+        game = games.MassGame(_table, prefetch=0, offset_factor=task["offset"], rng=rng)
+        for _ in range(task["questions"]):
+            question = game.current_question
+            error = 0.02 if rng.random() < know[question.index] else 0.25
+            guess = question.mass * (1 + rng.gauss(0, error))
+            answer = min(game.get_answers(), key=lambda mass: abs(mass - guess))
+            solved += answer == question.mass
+            game.update(answer)
+    return {"solved": solved}
+
+
+def _play_periodic(task: dict, rng: random.Random) -> dict:
+    # Counts the clicks needed to fill the whole table
+    know = _know_chances(task["model"], task["skill"])
+    all_elements = _table.get_all_elements()
+    clicks = Counter()
+
+    for _ in range(task["learners"]):
+        game = games.PeriodicGame(_table, rng=rng)
+        used = 0
+        while game.current_question is not None:
+            used += 1
+            question = game.current_question
+            game.update(question if rng.random() < know[question.index] else rng.choice(all_elements))
+        clicks[used] += 1
+    return {"clicks": clicks}
+
+
+PLAYERS = {"base": _play_base, "mass": _play_mass, "periodic": _play_periodic}
+
+
+def _run_chunk(task: dict) -> tuple[tuple, dict]:
+    # Runs in a worker. The learners and the games share one generator seeded from the task.
+    result = PLAYERS[task["mode"]](task, random.Random(task["seed"]))
+    return task["key"], result
+
+
+def _merge(total: dict, result: dict) -> None:
+    for name, value in result.items():
+        total[name] = total.get(name, Counter() if isinstance(value, Counter) else 0) + value
+
+
+def _percentile(counts: Counter, fraction: float) -> int:
+    seen = 0
+    total = sum(counts.values())
+    for value in sorted(counts):
+        seen += counts[value]
+        if seen >= fraction * total:
+            return value
+    return 0
+
+
+def _tasks(args) -> list[dict]:
+    # One task per chunk of learners, for every game and setting
+    settings = [("base", {"game": game}) for game in BASE_GAMES]
+    settings += [("mass", {"offset": offset}) for offset in args.mass_offsets]
+    settings.append(("periodic", {}))
+
+    tasks = []
+    for mode, setting in settings:
+        learners = args.learners if mode != "periodic" else max(1, args.learners // 50) # A whole table is long
+        for start in range(0, learners, CHUNK_SIZE):
+            tasks.append({
+                "key": (mode, tuple(setting.items())),
+                "mode": mode,
+                "model": args.model,
+                "skill": args.skill,
+                "questions": args.questions,
+                "learners": min(CHUNK_SIZE, learners - start),
+                "seed": f"{args.seed}-{len(tasks)}", # Unrelated streams for every run seed and task
+                **setting})
+    return tasks
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--learners", type=int, default=100000, help="learners per game and setting")
+    parser.add_argument("--questions", type=int, default=20, help="questions per learner")
+    parser.add_argument("--model", choices=ERROR_MODELS, default="uniform")
+    parser.add_argument("--skill", type=float, default=0.6, help="chance of knowing an answer")
+    parser.add_argument("--mass-offsets", type=float, nargs="+", default=[0.05, 0.125, 0.25])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    tasks = _tasks(args)
+    results = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(args.workers, initializer=_init_worker) as pool:
+        for key, result in pool.map(_run_chunk, tasks, chunksize=1):
+            _merge(results.setdefault(key, {}), result)
+    elapsed = time.perf_counter() - start
+
+    print(f"Modell: {args.model}, skill {args.skill}, {len(tasks)} uppgifter på {args.workers} processer, {elapsed:.1f} s\n")
+
+    print(f"{'spel':<10}{'frågor':>10}{'rätt':>8}{'försök/fråga':>14}")
+    for game in BASE_GAMES:
+        result = results[("base", (("game", game),))]
+        attempts = result["attempts"]
+        questions = sum(attempts.values())
+        mean = sum(used * count for used, count in attempts.items()) / questions
+        print(f"{game:<10}{questions:>10}{result['solved'] / questions:>8.1%}{mean:>14.2f}")
+
+    print(f"\n{'massa, offset':<16}{'frågor':>10}{'rätt':>8}")
+    questions = args.learners * args.questions
+    for offset in args.mass_offsets:
+        result = results[("mass", (("offset", offset),))]
+        print(f"{offset:<16}{questions:>10}{result['solved'] / questions:>8.1%}")
+
+    clicks = results[("periodic", ())]["clicks"]
+    played = sum(clicks.values())
+    mean = sum(used * count for used, count in clicks.items()) / played
+    print(f"\nperiodiska tabellen, {played} spel: klick medel {mean:.0f},"
+          f" median {_percentile(clicks, 0.5)}, p95 {_percentile(clicks, 0.95)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+P-uppgift - periodiska systemet
+tests of games.py
+"""
+
+import random
+import unittest
+import games
+from model import PeriodicTable
+
+
+class MassGameTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.elements = PeriodicTable()
+
+
+    def test_decoy_pools(self):
+        for offset_factor, min_offset in ((0.125, 5), (0.05, 1), (0.5, 5)):
+            pools = games._decoy_pools(self.elements, offset_factor, min_offset)
+            self.assertIs(pools, games._decoy_pools(self.elements, offset_factor, min_offset)) # Built once
+            for element, (candidates, true_rounded) in zip(self.elements.get_all_elements(), pools):
+                offset = max(element.mass * offset_factor, min_offset)
+                self.assertGreaterEqual(candidates.start, 1)
+                self.assertLessEqual(abs(candidates.start - max(element.mass - offset, 1)), 0.5)
+                self.assertLessEqual(abs(candidates[-1] - (element.mass + offset)), 0.5)
+                self.assertIn(true_rounded, candidates)
+
+
+    def test_answers(self):
+        rng = random.Random(0)
+        for choices in (1, 2, 3, 5):
+            game = games.MassGame(self.elements, choices=choices, rng=rng)
+            for _ in range(300):
+                question = game.current_question
+                answers = game.get_answers()
+                candidates, _ = game.decoy_pools[question.index]
+                self.assertEqual(len(answers), choices)
+                self.assertIn(question.mass, answers)
+                self.assertEqual(len({round(mass) for mass in answers}), choices) # Tells the choices apart
+                self.assertTrue(all(round(mass) in candidates for mass in answers))
+                game.update(rng.choice(answers))
+                game.prefetch()
+
+
+    def test_choices_checked_when_created(self):
+        smallest = min(len(candidates) for candidates, _ in games._decoy_pools(self.elements, 0.05, 1))
+        games.MassGame(self.elements, offset_factor=0.05, min_offset=1, choices=smallest)
+        for choices in (0, smallest + 1):
+            with self.subTest(choices), self.assertRaises(ValueError):
+                games.MassGame(self.elements, offset_factor=0.05, min_offset=1, choices=choices)
+
+
+class PeriodicGameTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.elements = PeriodicTable()
+
+
+    def test_board_masks(self):
+        masks = games.board_masks(self.elements)
+        self.assertIs(masks, games.board_masks(self.elements)) # Built once
+        self.assertEqual(masks.all, (1 << len(self.elements)) - 1)
+        for element in self.elements.get_all_elements():
+            bit = 1 << element.index
+            self.assertTrue(masks.periods[element.period] & bit)
+            self.assertTrue(masks.families[element.family] & bit)
+            self.assertEqual(bool(masks.groups.get(element.group, 0) & bit), element.group is not None)
+        for by in (masks.periods, masks.families):
+            self.assertEqual(sum(mask.bit_count() for mask in by.values()), len(self.elements)) # Disjoint
+
+
+    def test_remaining(self):
+        game = games.PeriodicGame(self.elements, rng=1)
+        for _ in range(40):
+            game.update(game.current_question)
+        placed = {element.index for element in game.get_placed()}
+        self.assertEqual(game.progress(), (40, len(self.elements)))
+        for period, group, family in ((None, None, None), (2, None, None), (None, 1, None), (6, None, "Lanthanides")):
+            expected = {element.index for element in self.elements.get_all_elements()
+                        if element.index not in placed and period in (None, element.period)
+                        and group in (None, element.group) and family in (None, element.family)}
+            mask = game.remaining(period, group, family)
+            self.assertEqual({index for index in range(len(self.elements)) if mask >> index & 1}, expected)
+
+
+    def test_wrong_answer_doesnt_place(self):
+        game = games.PeriodicGame(self.elements, rng=1)
+        question = game.current_question
+        game.update(self.elements.get_element((question.index + 1) % len(self.elements)))
+        self.assertEqual(game.get_board(), 0)
+        self.assertIs(game.current_question, question)
+
+
+    def test_undo(self):
+        game = games.PeriodicGame(self.elements, rng=1)
+        self.assertIsNone(game.undo())
+        boards = [game.get_board()]
+        questions = [game.current_question]
+        for _ in range(5):
+            game.update(game.current_question)
+            boards.append(game.get_board())
+            questions.append(game.current_question)
+        for _ in range(5):
+            boards.pop()
+            questions.pop()
+            self.assertIs(game.undo(), questions[-1])
+            self.assertEqual(game.get_board(), boards[-1])
+        self.assertIsNone(game.undo())
+
+
+    def test_whole_table_and_state(self):
+        game = games.PeriodicGame(self.elements, rng=2)
+        for _ in range(30):
+            game.update(game.current_question)
+        restored = games.PeriodicGame(self.elements, rng=3)
+        restored.set_state(game.get_state())
+        self.assertEqual(restored.get_state(), game.get_state())
+
+        while restored.current_question is not None:
+            restored.update(restored.current_question)
+        self.assertEqual(restored.get_board(), games.board_masks(self.elements).all)
+        self.assertEqual(restored.remaining(), 0)
+        self.assertEqual(restored.hint(), "")
+        self.assertIs(restored.undo(), restored.current_question) # The last element can be taken back
+
+
+if __name__ == "__main__":
+    unittest.main()
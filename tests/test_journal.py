@@ -0,0 +1,162 @@
+"""
+P-uppgift - periodiska systemet
+tests of journal.py, resuming a game after a crash
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import games
+import journal
+from model import PeriodicTable
+
+GAMES = (games.AtnumGame, games.NameGame, games.SymbolGame, games.MassGame, games.PeriodicGame)
+
+
+def answer_for(game, rng: random.Random):
+    """Returns a right or a wrong answer to the current question, the way the GUI gives it."""
+
+    question = game.current_question
+    right = rng.random() < 0.6
+    if isinstance(game, games.MassGame):
+        return question.mass if right else rng.choice(game.get_answers())
+    if isinstance(game, games.PeriodicGame):
+        return question if right else game.elements.get_element(rng.randrange(len(game.elements)))
+    return str(getattr(question, game.correct_attr)) if right else "1"
+
+
+def play(game, session, answers: int, rng: random.Random) -> None:
+    """Answers the game and records every answer in session, a journal or a recorder."""
+
+    for _ in range(answers):
+        if game.current_question is None: # A finished PeriodicGame
+            return
+        answer = answer_for(game, rng)
+        game.update(answer)
+        session.record(answer)
+        if isinstance(game, games.MassGame):
+            game.prefetch() # Like the App does after every answer
+
+
+class SessionJournalTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.elements = PeriodicTable()
+
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+
+    def _journal(self, game_class, **options) -> journal.SessionJournal:
+        return journal.SessionJournal(os.path.join(self.directory, game_class.__name__), self.elements, **options)
+
+
+    def test_resume_gives_the_same_state(self):
+        for game_class in GAMES:
+            with self.subTest(game_class.__name__):
+                game = game_class(self.elements, rng=1)
+                session = self._journal(game_class, compact_every=16)
+                session.start(game, {"results_game": 7})
+                rng = random.Random(2)
+                for _ in range(12): # Crosses a couple of compactions
+                    play(game, session, 4, rng)
+                    session.flush()
+                session.close()
+
+                resumed = self._journal(game_class)
+                self.assertEqual(resumed.resume(game_class).get_state(), game.get_state())
+                self.assertEqual(resumed.info, {"results_game": 7})
+                resumed.close()
+
+
+    def test_record_doesnt_write(self):
+        game = games.AtnumGame(self.elements, rng=1)
+        session = self._journal(games.AtnumGame, compact_every=4)
+        session.start(game)
+        play(game, session, 20, random.Random(2))
+        self.assertEqual(os.path.getsize(session.journal_path), 0)
+        self.assertEqual(session.snapshot_seq, 0)
+        session.flush()
+        self.assertEqual(session.snapshot_seq, 20) # Compacted by the flush
+        session.close()
+
+
+    def test_torn_record_is_skipped(self):
+        game = games.NameGame(self.elements, rng=1)
+        session = self._journal(games.NameGame)
+        session.start(game)
+        play(game, session, 10, random.Random(2))
+        session.close()
+        state = game.get_state()
+
+        # A crash in the middle of writing the next record
+        with open(session.journal_path, "ab") as file:
+            file.write(journal.RECORD_HEADER.pack(100, 0) + b"torn")
+        resumed = self._journal(games.NameGame)
+        game = resumed.resume(games.NameGame)
+        self.assertEqual(game.get_state(), state)
+
+        # New records are appended after the valid ones, not after the torn one
+        play(game, resumed, 5, random.Random(3))
+        resumed.close()
+        self.assertEqual(self._journal(games.NameGame).resume(games.NameGame).get_state(), game.get_state())
+
+
+    def test_crash_between_snapshot_and_truncate(self):
+        game = games.MassGame(self.elements, rng=1)
+        session = self._journal(games.MassGame, compact_every=1000)
+        session.start(game)
+        play(game, session, 20, random.Random(2))
+        session.flush()
+        with open(session.journal_path, "rb") as file:
+            log = file.read()
+
+        # The snapshot already covers the answers, but the journal was not truncated
+        session._compact()
+        session.close()
+        with open(session.journal_path, "wb") as file:
+            file.write(log)
+        self.assertEqual(self._journal(games.MassGame).resume(games.MassGame).get_state(), game.get_state())
+
+
+    def test_other_table_is_not_resumed(self):
+        session = self._journal(games.PeriodicGame)
+        game = games.PeriodicGame(self.elements, rng=1)
+        session.start(game)
+        play(game, session, 60, random.Random(2))
+        session.close()
+
+        # The same session with an element file that has only the first 50 elements
+        path = os.path.join(self.directory, "elements.txt")
+        with open("elements.txt", encoding="utf-8") as source, open(path, "w", encoding="utf-8") as file:
+            rows = sorted((line.split() for line in source if line.strip()), key=lambda fields: int(fields[1]))
+            file.writelines(" ".join(fields) + "\n" for fields in rows[:50])
+        small = journal.SessionJournal(session.snapshot_path[:-len(".snap")], PeriodicTable(path))
+        self.assertIsNone(small.resume(games.PeriodicGame))
+
+
+    def test_broken_state_is_not_resumed(self):
+        session = self._journal(games.PeriodicGame)
+        game = games.PeriodicGame(self.elements, rng=1)
+        session.start(game)
+        game.order[0] = 250 # An index outside of the table
+        session.close()
+        session._compact()
+        self.assertIsNone(self._journal(games.PeriodicGame).resume(games.PeriodicGame))
+
+
+    def test_nothing_to_resume(self):
+        session = self._journal(games.AtnumGame)
+        self.assertIsNone(session.resume(games.AtnumGame))
+        session.start(games.AtnumGame(self.elements))
+        session.close()
+        self.assertIsNone(self._journal(games.AtnumGame).resume(games.NameGame)) # Another game
+
+
+if __name__ == "__main__":
+    unittest.main()
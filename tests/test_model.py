@@ -0,0 +1,97 @@
+"""
+P-uppgift - periodiska systemet
+tests of model.py, loading element files
+"""
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import model
+from model import ELEMENT_SCHEMA, LoadError, PeriodicTable
+
+ROWS = """\
+# symbol atnum name mass period group family
+He 2 Helium 4.0026 1 18 Noble_gases
+H 1 Väte 1.00794 1 1 Nonmetals
+
+Li 3 Litium 6.941 2 1 Alkali_metals
+"""
+
+
+class LoaderTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+
+    def _write(self, text: str) -> str:
+        path = os.path.join(self.directory, "elements.txt")
+        with open(path, "w", encoding="utf-8") as file:
+            file.write(text)
+        return path
+
+
+    def test_iter_rows(self):
+        rows = list(model.iter_rows(io.StringIO(ROWS)))
+        self.assertEqual([line_no for line_no, _ in rows], [2, 3, 5])
+        self.assertEqual(rows[1][1], ("H", 1, "Väte", 1.00794, 1, 1, model.FAMILIES.index("Nonmetals")))
+
+
+    def test_errors_have_line_numbers(self):
+        text = ROWS + "Be 4 Beryllium x 2 2 Alkaline_earth_metals\nB 5 Bor\nC 6 Kol 12.011 2 14 Ickemetall\n"
+        with self.assertRaises(LoadError) as raised:
+            list(model.iter_rows(io.StringIO(text)))
+        self.assertEqual(raised.exception.line_no, 6)
+
+        errors = []
+        rows = list(model.iter_rows(io.StringIO(text), errors=errors))
+        self.assertEqual(len(rows), 3)
+        self.assertEqual([error.line_no for error in errors], [6, 7, 8])
+        self.assertIn("mass", str(errors[0]))
+        self.assertIn("7 kolumner", str(errors[1]))
+        self.assertIn("okänd familj", str(errors[2]))
+
+
+    def test_table_is_sorted_and_skips_bad_rows(self):
+        table = PeriodicTable(self._write(ROWS + "H 1 Väte 1.0 1 1 Nonmetals\nX 7 Trasig\n"), skip_errors=True)
+        self.assertEqual([element.symbol for element in table.get_all_elements()], ["H", "He", "Li"])
+        self.assertEqual([error.line_no for error in table.load_errors], [6, 7])
+        self.assertIn("finns redan", str(table.load_errors[0]))
+        self.assertIs(table.lookup_by_name("väte"), table.get_element(0))
+        self.assertEqual(table.get_element(1).pos, (1, 18))
+
+
+    def test_bad_or_empty_file_exits(self):
+        for text in (ROWS + "X 7 Trasig\n", "# bara kommentarer\n"):
+            with self.subTest(text), self.assertRaises(SystemExit):
+                PeriodicTable(self._write(text))
+
+
+    def test_optional_columns(self):
+        schema = ELEMENT_SCHEMA + (("name_en", str, None), ("name_de", str, None))
+        text = ROWS.replace("Noble_gases", "Noble_gases Helium Helium").replace("Nonmetals", "Nonmetals Hydrogen")
+        table = PeriodicTable(self._write(text), schema=schema)
+        self.assertEqual([element.get("name_en") for element in table.get_all_elements()], ["Hydrogen", "Helium", None])
+        self.assertEqual(table.get_element(1).get("name_de"), "Helium")
+
+        # The cache of the same file read with another schema isnt used
+        with self.assertRaises(SystemExit):
+            PeriodicTable(self._write(text)) # Too many columns without the optional ones
+        with self.assertRaises(ValueError):
+            PeriodicTable(self._write(ROWS), schema=(("name_en", str, None),))
+
+
+    def test_large_table(self):
+        # More elements than fit in a byte, the indexes need a wider typecode
+        lines = [f"X{atnum} {atnum} Namn{atnum} {atnum * 2.5} 7 1 Other\n" for atnum in range(1000, 0, -1)]
+        table = PeriodicTable(self._write("".join(lines)))
+        self.assertEqual(len(table), 1000)
+        self.assertEqual(table.get_all_indexes().typecode, "H")
+        self.assertEqual(table.lookup_by_atnum(500).index, 499)
+
+
+if __name__ == "__main__":
+    unittest.main()
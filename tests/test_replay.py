@@ -0,0 +1,61 @@
+"""
+P-uppgift - periodiska systemet
+tests of replay.py
+"""
+
+import os
+import random
+import shutil
+import tempfile
+import unittest
+import replay
+from model import PeriodicTable
+from tests.test_journal import GAMES, play
+
+
+class ReplayTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.elements = PeriodicTable()
+
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+
+    def _record(self, game_class, seed: int) -> str:
+        game = game_class(self.elements, rng=seed)
+        recorder = replay.SessionRecorder(game, seed)
+        play(game, recorder, 40, random.Random(seed))
+        path = os.path.join(self.directory, f"{game_class.__name__}.rec")
+        recorder.save(path)
+        return path
+
+
+    def test_round_trip(self):
+        for game_class in GAMES:
+            with self.subTest(game_class.__name__):
+                recording = replay.load(self._record(game_class, 5))
+                self.assertEqual(len(recording["answers"]), 40)
+                replay.replay(self.elements, recording) # Raises ReplayError if the state differs
+
+
+    def test_changed_recording_fails(self):
+        recording = replay.load(self._record(replay.GAMES["NameGame"], 5))
+        recording["seed"] += 1 # Other questions, so the same answers end in another state
+        with self.assertRaises(replay.ReplayError):
+            replay.replay(self.elements, recording)
+
+
+    def test_not_a_recording(self):
+        path = os.path.join(self.directory, "broken.rec")
+        with open(path, "wb") as file:
+            file.write(b"not marshal")
+        with self.assertRaises(replay.ReplayError):
+            replay.load(path)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+P-uppgift - periodiska systemet
+tests of results.py, the scores and the leaderboard
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+import results
+
+
+class ResultsStoreTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.store = results.ResultsStore(os.path.join(self.directory, "results.sqlite3"), batch_size=8)
+        self.addCleanup(self.store.db.close)
+
+
+    def _play(self, user: str, right: int, wrong: int, game: str = "NameGame", goal=None) -> None:
+        self.store.start_game(game, user, goal)
+        for answer in range(right + wrong):
+            self.store.record_answer(1 + answer % 103, answer < right)
+        self.store.end_game()
+
+
+    def test_score(self):
+        self.assertIsNone(results.score(0, 0))
+        self.assertIsNone(results.score(10, results.MIN_ANSWERS - 1)) # Too short to be ranked
+        self.assertEqual(results.score(15, 20), 0.75)
+        self.assertIsNone(results.score(50, 60, goal=103)) # Not finished
+        self.assertEqual(results.score(103, 206, goal=103), 0.5)
+
+
+    def test_leaderboard_ranks_by_share_of_right(self):
+        self._play("a", 30, 10)
+        self._play("b", 19, 1)
+        self._play("c", 5, 0) # Too short
+        self._play("a", 10, 30) # Worse than the best game of a
+        self.assertEqual([row[:3] for row in self.store.leaderboard("NameGame")], [("b", 19, 20), ("a", 30, 40)])
+        self.assertEqual(self.store.personal_best("NameGame", "a")[:2], (30, 40))
+        self.assertIsNone(self.store.personal_best("NameGame", "c"))
+        self.assertEqual([row[2:] for row in self.store.history("NameGame", "a")], [(40, 10), (40, 30)])
+
+
+    def test_periodic_game_only_ranked_when_finished(self):
+        self._play("a", 50, 0, "PeriodicGame", goal=103)
+        self._play("b", 103, 40, "PeriodicGame", goal=103)
+        self._play("c", 103, 80, "PeriodicGame", goal=103)
+        self.assertEqual([row[0] for row in self.store.leaderboard("PeriodicGame")], ["b", "c"])
+
+
+    def test_suspended_game_is_ranked_when_it_ends(self):
+        self.store.start_game("NameGame", "a")
+        for _ in range(20):
+            self.store.record_answer(1, True)
+        game_id = self.store.game_id
+        self.store.suspend()
+        self.assertIsNone(self.store.personal_best("NameGame", "a"))
+
+        self.store.start_game("NameGame", "a", resume_id=game_id)
+        self.assertEqual(self.store.game_id, game_id)
+        for _ in range(30):
+            self.store.record_answer(1, False)
+        self.store.end_game()
+        self.assertEqual(self.store.personal_best("NameGame", "a")[:2], (20, 50))
+        self.assertEqual(self.store.db.execute("SELECT count(*) FROM games").fetchone()[0], 1)
+
+
+    def test_resume_id_of_another_user(self):
+        self.store.start_game("NameGame", "a")
+        self.store.record_answer(1, True)
+        game_id = self.store.game_id
+        self.store.suspend()
+        self.store.start_game("NameGame", "b", resume_id=game_id)
+        self.assertNotEqual(self.store.game_id, game_id)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+"""
+P-uppgift - periodiska systemet
+tests of scheduler.py
+"""
+
+import random
+import unittest
+from scheduler import FenwickTree, LeitnerScheduler
+
+
+class FenwickTreeTest(unittest.TestCase):
+
+    def test_find_matches_prefix_sums(self):
+        rng = random.Random(0)
+        for size in (1, 2, 3, 7, 8, 9, 103):
+            weights = [rng.choice((0, 1, 2, 4, 8, 16)) for _ in range(size)]
+            weights[rng.randrange(size)] += 1 # At least one weight
+            tree = FenwickTree(weights)
+
+            # The first index where the prefix sum is larger than the value, by brute force
+            expected = [index for index, weight in enumerate(weights) for _ in range(weight)]
+            self.assertEqual(tree.total(), len(expected))
+            self.assertEqual([tree.find(value) for value in range(tree.total())], expected)
+
+
+    def test_find_after_add(self):
+        rng = random.Random(1)
+        weights = [rng.randrange(10) for _ in range(50)]
+        tree = FenwickTree(weights)
+        for _ in range(200):
+            index = rng.randrange(len(weights))
+            delta = rng.randrange(-weights[index], 10)
+            weights[index] += delta
+            tree.add(index, delta)
+        expected = [index for index, weight in enumerate(weights) for _ in range(weight)]
+        self.assertEqual([tree.find(value) for value in range(tree.total())], expected)
+
+
+class LeitnerSchedulerTest(unittest.TestCase):
+
+    def test_state_round_trip(self):
+        scheduler = LeitnerScheduler(20)
+        for index in range(10):
+            scheduler.correct(index)
+        scheduler.wrong(3)
+        restored = LeitnerScheduler(20)
+        restored.set_state(scheduler.get_state())
+        self.assertEqual(restored.get_state(), scheduler.get_state())
+        self.assertEqual([restored.next(random.Random(2)) for _ in range(20)],
+                         [scheduler.next(random.Random(2)) for _ in range(20)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,210 @@
+"""
+P-uppgift - periodiska systemet
+worksheets-file, generates printable worksheets with answer keys as PDF, without a GUI
+
+Every worksheet is one page with the periodic table laid out like the Table in the GUI, where
+some elements are left blank for the student to fill in, and a few questions from the games.
+The answer key has the same page with the blanks and the answers filled in.
+
+The pages are drawn in a process pool. Every part of a page that doesnt depend on the
+worksheet is drawn once per worker and reused, and the pages are written to the two PDF files
+as they arrive, so memory use doesnt grow with the number of worksheets.
+
+Run from the repository root: python worksheets.py [-n N] [--seed N] [--workers N] [--out DIR]
+"""
+
+import argparse
+import os
+import random
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+import games
+from model import PeriodicTable
+
+PAGE_WIDTH, PAGE_HEIGHT = 842, 595 # A4 landscape in points
+ROWS, COLS = 10, 18 # Same grid as Table
+CELL_PITCH = 40
+CELL_SIZE = 38
+TABLE_LEFT = (PAGE_WIDTH - COLS*CELL_PITCH) / 2
+TABLE_TOP = 535 # Upper edge of the first row
+
+BLANKS = 20 # Elements to fill in per worksheet
+CHUNK_SIZE = 50 # Worksheets per task sent to a worker
+
+
+def _escape(text: str) -> bytes:
+    # A PDF string in WinAnsiEncoding, which has the Swedish letters
+    return text.encode("cp1252", "replace").replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _rgb(color: str) -> str:
+    return " ".join(f"{int(color[i:i+2], 16) / 255:.3f}" for i in (1, 3, 5))
+
+
+def _text(x: float, y: float, size: float, text: str, font: str = "F1") -> bytes:
+    return b"BT /%s %g Tf %g %g Td (%s) Tj ET\n" % (font.encode(), size, x, y, _escape(text))
+
+
+class PDFWriter:
+    """Writes a PDF one page at a time. Only the file offsets of the objects are kept, so
+    the number of pages doesnt affect the memory use."""
+
+    # Object 1 is the catalog, 2 the page tree and 3-4 the fonts, the pages come after
+    FONTS = {"F1": "Helvetica", "F2": "Helvetica-Bold"}
+
+    def __init__(self, path: str, width: float = PAGE_WIDTH, height: float = PAGE_HEIGHT):
+        self.file = open(path, "wb")
+        self.width = width
+        self.height = height
+        self.offsets = [0] * (2 + len(self.FONTS)) # Offset of every object, filled in when written
+        self.pages = []
+
+        self.file.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for number, (name, font) in enumerate(self.FONTS.items(), 3):
+            self._write_object(number, b"<< /Type /Font /Subtype /Type1 /BaseFont /%s /Encoding /WinAnsiEncoding >>" % font.encode())
+
+
+    def _write_object(self, number: int, body: bytes) -> None:
+        self.offsets[number - 1] = self.file.tell()
+        self.file.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+
+
+    def _new_object(self) -> int:
+        self.offsets.append(0)
+        return len(self.offsets)
+
+
+    def add_page(self, content: bytes) -> None:
+        """Adds a page, content is the zlib compressed content stream."""
+
+        stream = self._new_object()
+        self._write_object(stream, b"<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream" % (len(content), content))
+        fonts = b" ".join(b"/%s %d 0 R" % (name.encode(), number) for number, name in enumerate(self.FONTS, 3))
+        page = self._new_object()
+        self._write_object(page, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %g %g] /Resources << /Font << %s >> >> /Contents %d 0 R >>"
+                           % (self.width, self.height, fonts, stream))
+        self.pages.append(page)
+
+
+    def close(self) -> None:
+        """Writes the page tree and the cross-reference table, and closes the file."""
+
+        kids = b" ".join(b"%d 0 R" % page for page in self.pages)
+        self._write_object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages)))
+        self._write_object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+
+        xref = self.file.tell()
+        self.file.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(self.offsets) + 1))
+        self.file.write(b"".join(b"%010d 00000 n \n" % offset for offset in self.offsets))
+        self.file.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(self.offsets) + 1, xref))
+        self.file.close()
+
+
+_table = None # The PeriodicTable of the worker process
+_cells = None # Element index -> drawing of the cell, as shown, blank and filled in for the key
+_banks = None # The question banks of the written games
+
+
+def _draw_cells(elements) -> dict[str, list[bytes]]:
+    cells = {"shown": [], "blank": [], "key": []}
+    for element in elements.get_all_elements():
+        row, col = element.pos
+        x = TABLE_LEFT + (col-1)*CELL_PITCH
+        y = TABLE_TOP - row*CELL_PITCH
+        rect = b"%g %g %d %d re f\n" % (x, y, CELL_SIZE, CELL_SIZE)
+        atnum = _text(x + 2, y + CELL_SIZE - 9, 7, str(element.atnum))
+        symbol = _text(x + 3, y + 5, 16, element.symbol, "F2")
+
+        cells["shown"].append(b"%s rg\n%s1 1 1 rg\n%s%s" % (_rgb(element.color).encode(), rect, atnum, symbol))
+        cells["blank"].append(b"%s rg\n%s0 0 0 rg\n%s" % (_rgb(element.bg_color).encode(), rect, atnum))
+        cells["key"].append(b"%s rg\n%s0 0 0 rg\n%s%s" % (_rgb(element.bg_color).encode(), rect, atnum, symbol))
+    return cells
+
+
+def _init_worker() -> None:
+    global _table, _cells, _banks
+    _table = PeriodicTable()
+    _cells = _draw_cells(_table)
+    _banks = [game(_table).bank for game in (games.AtnumGame, games.NameGame, games.SymbolGame)]
+
+
+def _questions(rng: random.Random) -> list[tuple[str, str]]:
+    # (question, answer) pairs taken from the games
+    questions = []
+    for bank in _banks:
+        for index in rng.sample(range(len(_table)), 2):
+            questions.append((bank.prompts[index], str(bank.correct[index])))
+
+    mass_game = games.MassGame(_table, prefetch=0, rng=rng)
+    choices = " / ".join(str(round(mass)) for mass in mass_game.get_answers())
+    questions.append((f"{mass_game.get_current_question()}? ({choices})", str(round(mass_game.current_question.mass))))
+    return questions
+
+
+def _render(number: int, seed: int) -> tuple[bytes, bytes]:
+    # Returns the compressed content streams of worksheet number and its answer key
+    rng = random.Random(f"{seed}-{number}")
+    blanks = set(games.PeriodicGame(_table, rng=rng).order[:BLANKS])
+    questions = _questions(rng)
+
+    pages = []
+    for key in (False, True):
+        title = f"Periodiska systemet, arbetsblad {number}" + (" - facit" if key else "")
+        parts = [b"0 0 0 rg\n", _text(TABLE_LEFT, 560, 16, title, "F2")]
+        if not key:
+            parts.append(_text(PAGE_WIDTH - TABLE_LEFT - 200, 560, 12, "Namn: ______________________"))
+        for index in range(len(_table)):
+            parts.append(_cells["key" if key else "blank"][index] if index in blanks else _cells["shown"][index])
+
+        parts.append(b"0 0 0 rg\n")
+        y = 105
+        for i, (question, answer) in enumerate(questions, 1):
+            x = TABLE_LEFT + (i - 1) // 4 * (COLS*CELL_PITCH / 2)
+            line = f"{i}. {question} " + (answer if key else "__________")
+            parts.append(_text(x, y - (i - 1) % 4 * 18, 10, line))
+        pages.append(zlib.compress(b"".join(parts)))
+    return pages[0], pages[1]
+
+
+def _render_chunk(task: tuple[int, int, int]) -> list[tuple[bytes, bytes]]:
+    first, count, seed = task
+    return [_render(number, seed) for number in range(first, first + count)]
+
+
+def generate(count: int, seed: int, out_dir: str, workers: int | None = None) -> tuple[str, str]:
+    """Writes count worksheets and their answer keys, returns the paths of the two PDFs."""
+
+    os.makedirs(out_dir, exist_ok=True)
+    sheets_path = os.path.join(out_dir, "arbetsblad.pdf")
+    keys_path = os.path.join(out_dir, "facit.pdf")
+    sheets = PDFWriter(sheets_path)
+    keys = PDFWriter(keys_path)
+
+    tasks = [(first, min(CHUNK_SIZE, count + 1 - first), seed) for first in range(1, count + 1, CHUNK_SIZE)]
+    with ProcessPoolExecutor(workers, initializer=_init_worker) as pool:
+        for pages in pool.map(_render_chunk, tasks): # In order, written as soon as they arrive
+            for sheet, key in pages:
+                sheets.add_page(sheet)
+                keys.add_page(key)
+    sheets.close()
+    keys.close()
+    return sheets_path, keys_path
+
+
+def main():
+    """Main"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", type=int, default=30, help="number of worksheets")
+    parser.add_argument("--seed", type=int, default=0, help="the same seed gives the same worksheets")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="arbetsblad")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    paths = generate(args.n, args.seed, args.out, args.workers)
+    print(f"{args.n} arbetsblad på {time.perf_counter() - start:.1f} s: {', '.join(paths)}")
+
+
+if __name__ == "__main__":
+    main()